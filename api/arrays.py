@@ -0,0 +1,25 @@
+import sqlite3
+
+import numpy as np
+
+
+def fetch(conn: sqlite3.Connection, sql: str, params=()) -> list[tuple]:
+    '''Plain tuples are much cheaper to build than `sqlite3.Row`.'''
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    return cursor.execute(sql, params).fetchall()
+
+
+def days(dates: list[str]) -> np.ndarray:
+    '''Day numbers (days since 1970-01-01) of ISO dates.'''
+    return np.array(dates, dtype='datetime64[D]').astype(np.int64)
+
+
+def column(rows: list, i: int) -> np.ndarray:
+    '''Float column with NULL as NaN.'''
+    return np.array([r[i] for r in rows], dtype=np.float64)
+
+
+def nullable(values: np.ndarray) -> list:
+    '''List with NaN as None, i.e. JSON null.'''
+    return [None if v != v else v for v in values.tolist()]
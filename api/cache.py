@@ -0,0 +1,90 @@
+import functools
+import secrets
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+import sanic
+import sanic.response
+
+import responses
+
+
+# headers that belong to one response and are not replayed from the cache
+RESPONSE_OWN_HEADERS = ('content-length', 'content-type', 'etag', 'cache-control')
+
+
+class ResponseCache:
+    '''
+    Caches handler responses until the data changes.
+
+    Entries are keyed by path and query string and belong to one data version,
+    all of them are dropped when the version changes. Least recently used entries
+    are evicted once their bodies exceed `max_bytes`. Responses carry an ETag
+    built from the version, so clients revalidating with `If-None-Match` get 304
+    without the handler running. Bodies are kept compressed, once per accepted encoding,
+    together with the headers of the handler (e.g. the cursor of the next page).
+    '''
+
+    def __init__(self, version: Callable[[], Hashable], max_bytes: int):
+        self._version = version
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._entries_version = None
+        # distinguishes ETags of different server runs
+        self._instance = secrets.token_hex(4)
+
+    def etag(self, version: Hashable) -> str:
+        return f'"{self._instance}-{version}"'
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    def get(self, key: Hashable, version: Hashable):
+        if version != self._entries_version:
+            self.clear()
+            self._entries_version = version
+            return None
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: Hashable, version: Hashable, body: bytes, content_type: str, headers: dict):
+        if version != self._entries_version or len(body) > self.max_bytes:
+            return
+        if key in self._entries:
+            self.size -= len(self._entries.pop(key)[0])
+        self._entries[key] = (body, content_type, headers)
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, (old_body, _, _) = self._entries.popitem(last=False)
+            self.size -= len(old_body)
+
+    def __call__(self, handler):
+        @functools.wraps(handler)
+        async def cached_handler(request: sanic.Request, *args, **kwargs):
+            version = self._version()
+            etag = self.etag(version)
+            headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+            if_none_match = request.headers.get('If-None-Match', '')
+            if etag in (tag.strip().removeprefix('W/') for tag in if_none_match.split(',')):
+                return sanic.response.empty(status=304, headers=headers)
+
+            key = (request.path, request.query_string, responses.negotiate(request))
+            entry = self.get(key, version)
+            if entry is not None:
+                body, content_type, response_headers = entry
+                return sanic.response.raw(body, content_type=content_type, headers={**headers, **response_headers})
+
+            response = await handler(request, *args, **kwargs)
+            # streamed responses are already sent
+            if response is not None and response.status == 200 and response.body is not None:
+                responses.compress(request, response)
+                response_headers = {k: v for k, v in response.headers.items() if k.lower() not in RESPONSE_OWN_HEADERS}
+                self.put(key, version, response.body, response.content_type, response_headers)
+                response.headers.update(headers)
+            return response
+
+        return cached_handler
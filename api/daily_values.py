@@ -0,0 +1,188 @@
+import bisect
+import sqlite3
+
+import events
+import fx_rates
+import positions
+import timeseries
+
+
+# every date present in any source table, each instrument gets a row for all of them, see `dates_params`
+DATES_SQL = '''
+    SELECT date(day + 2440587.5) AS date FROM fx_prices WHERE day >= :since_day UNION
+    SELECT date FROM trades WHERE date >= :since UNION
+    SELECT date(day + 2440587.5) FROM prices WHERE day >= :since_day UNION
+    SELECT date FROM manual_values WHERE date >= :since
+    ORDER BY date
+'''
+
+FIRST_DATE = '0000-00-00'
+
+
+def dates_params(since: str) -> dict:
+    return {'since': since, 'since_day': timeseries.day(since)}
+
+
+INVESTMENT = '(CASE WHEN volume THEN volume ELSE 1 END)*price/(CASE WHEN rate THEN rate ELSE 1 END)'
+
+
+def ensure(conn: sqlite3.Connection, base_currency: str):
+    '''Fills in the table and the position ledger when they are empty, e.g. right after they were created.'''
+    if (
+        conn.execute('SELECT 1 FROM daily_values LIMIT 1').fetchone() is None
+        or conn.execute('SELECT 1 FROM positions LIMIT 1').fetchone() is None
+        and conn.execute('SELECT 1 FROM trades WHERE volume IS NOT NULL LIMIT 1').fetchone() is not None
+    ):
+        rebuild(conn, base_currency)
+
+
+def rebuild(conn: sqlite3.Connection, base_currency: str):
+    conn.execute('DELETE FROM daily_values')
+    fx_rates.update(conn, base_currency, {currency: FIRST_DATE for currency in fx_rates.currencies(conn)})
+    update(conn, base_currency, {d['ticker']: FIRST_DATE for d in conn.execute('SELECT ticker FROM instruments')})
+
+
+def update_currencies(conn: sqlite3.Connection, base_currency: str, changes: dict[str, str]):
+    '''
+    Recomputes instruments quoted in changed currencies.
+    `changes` maps currency to the earliest date with changed fx data.
+    '''
+    tickers = {}
+    for d in conn.execute('SELECT ticker, currency FROM instruments'):
+        if d['currency'] in changes:
+            tickers[d['ticker']] = changes[d['currency']]
+    update(conn, base_currency, tickers)
+
+
+def update(conn: sqlite3.Connection, base_currency: str, changes: dict[str, str]):
+    '''
+    Recomputes the position ledger and daily values of changed instruments.
+    `changes` maps ticker to the earliest date with changed trades, prices or manual values,
+    only rows from that date on are rewritten.
+    '''
+    positions.update(conn, changes)
+    # daily fx rates follow the data range, instruments in extended currencies are revalued too
+    fx_changes = fx_rates.ensure(conn, base_currency)
+    if fx_changes:
+        changes = dict(changes)
+        for d in conn.execute('SELECT ticker, currency FROM instruments'):
+            if d['currency'] in fx_changes:
+                changes[d['ticker']] = min(changes.get(d['ticker'], fx_changes[d['currency']]), fx_changes[d['currency']])
+    if not changes:
+        return
+    events.record(conn, ['daily_values'], changes)
+    since = min(changes.values())
+    dates = [d['date'] for d in conn.execute(DATES_SQL, dates_params(since))]
+
+    # dates that appeared for the first time need a row for every instrument
+    missing = conn.execute('''
+        SELECT min(date) AS date FROM (''' + DATES_SQL + ''')
+        WHERE date >= (SELECT min(date) FROM daily_values)
+        AND date NOT IN (SELECT date FROM daily_values WHERE date >= :since)
+    ''', dates_params(since)).fetchone()['date']
+    if missing is not None:
+        changes = {
+            d['ticker']: min(changes.get(d['ticker'], missing), missing)
+            for d in conn.execute('SELECT ticker FROM instruments')
+        }
+
+    for ticker, ticker_since in changes.items():
+        _recompute(conn, base_currency, ticker, ticker_since, dates[bisect.bisect_left(dates, ticker_since):])
+
+
+def _as_of(conn: sqlite3.Connection, sql: str, params: list):
+    row = conn.execute(sql, params).fetchone()
+    return row[0] if row else None
+
+
+def _recompute(conn: sqlite3.Connection, base_currency: str, ticker: str, since: str, dates: list[str]):
+    conn.execute('DELETE FROM daily_values WHERE ticker = ? AND date >= ?', [ticker, since])
+    instrument = conn.execute('SELECT currency, evaluation FROM instruments WHERE ticker = ?', [ticker]).fetchone()
+    first_date = _as_of(conn, '''
+        SELECT min(date) FROM (
+            SELECT date FROM trades WHERE ticker = :ticker UNION ALL
+            SELECT date FROM manual_values WHERE ticker = :ticker
+        )''', {'ticker': ticker})
+    if instrument is None or first_date is None:
+        return
+    if first_date > since:
+        dates = dates[bisect.bisect_left(dates, first_date):]
+    manual = instrument['evaluation'] == 'manual'
+    currency = instrument['currency']
+
+    # state as of the day before `since`
+    investment, fee = conn.execute('''
+        SELECT sum(''' + INVESTMENT + '''), sum(fee) FROM trades WHERE ticker = ? AND date < ?
+    ''', [ticker, since]).fetchone()
+    instrument_id = _as_of(conn, 'SELECT id FROM instrument_ids WHERE ticker = ?', [ticker])
+    price = _as_of(conn, 'SELECT close FROM prices WHERE instrument = ? AND day < ? ORDER BY day DESC LIMIT 1', [instrument_id, timeseries.day(since)])
+    fx = 1 if currency == base_currency else _as_of(conn, '''
+        SELECT rate FROM fx_daily WHERE from_curr = ? AND to_curr = ? AND date < ? ORDER BY date DESC LIMIT 1
+    ''', [currency, base_currency, since])
+    manual_date, manual_value = conn.execute('''
+        SELECT date, value FROM manual_values WHERE ticker = ? AND date < ? ORDER BY date DESC LIMIT 1
+    ''', [ticker, since]).fetchone() or (None, None)
+    # investment up to the last manual value, trades after it are added to the value
+    manual_investment = _as_of(conn, '''
+        SELECT sum(''' + INVESTMENT + ''') FROM trades WHERE ticker = ? AND date <= ?
+    ''', [ticker, manual_date]) if manual_date else None
+
+    trades = conn.execute('''
+        SELECT date, volume, price, fee, rate FROM trades WHERE ticker = ? AND date >= ? ORDER BY date, id
+    ''', [ticker, since]).fetchall()
+    # split adjusted volume comes from the ledger, starting with the interval in force on `since`
+    intervals = conn.execute('''
+        SELECT start_date, volume FROM positions WHERE ticker = ? AND end_date > ? ORDER BY start_date
+    ''', [ticker, since]).fetchall()
+    prices = conn.execute('''
+        SELECT date(day + 2440587.5) AS date, close FROM prices WHERE instrument = ? AND day >= ? ORDER BY day
+    ''', [instrument_id, timeseries.day(since)]).fetchall()
+    rates = [] if currency == base_currency else conn.execute('''
+        SELECT date, rate FROM fx_daily WHERE from_curr = ? AND to_curr = ? AND date >= ? ORDER BY date
+    ''', [currency, base_currency, since]).fetchall()
+    manual_values = conn.execute('SELECT date, value FROM manual_values WHERE ticker = ? AND date >= ? ORDER BY date', [ticker, since]).fetchall()
+    if fx is None:
+        # before the first known rate use the earliest one
+        fx = rates[0]['rate'] if rates else None
+
+    rows = []
+    volume = None
+    ti = vi = pi = ri = mi = 0
+    for date in dates:
+        while ti < len(trades) and trades[ti]['date'] <= date:
+            t = trades[ti]
+            if t['price'] is not None:
+                investment = (investment or 0) + (t['volume'] if t['volume'] else 1)*t['price']/(t['rate'] if t['rate'] else 1)
+            if t['fee'] is not None:
+                fee = (fee or 0) + t['fee']
+            ti += 1
+        while vi < len(intervals) and intervals[vi]['start_date'] <= date:
+            volume = intervals[vi]['volume']
+            vi += 1
+        while pi < len(prices) and prices[pi]['date'] <= date:
+            price = prices[pi]['close']
+            pi += 1
+        while ri < len(rates) and rates[ri]['date'] <= date:
+            fx = rates[ri]['rate']
+            ri += 1
+        while mi < len(manual_values) and manual_values[mi]['date'] <= date:
+            manual_date, manual_value = manual_values[mi]
+            manual_investment = None
+            mi += 1
+        if manual_date == date:
+            manual_investment = investment
+
+        value = None
+        if fx is not None:
+            if manual:
+                if manual_value is not None:
+                    correction = (investment or 0) - (manual_investment or 0)
+                    value = fx*(manual_value + correction)
+            elif price is not None and volume is not None:
+                value = fx*price*volume
+        rows.append((date, ticker, volume, investment, fee, price, fx, manual_value, value))
+
+    conn.executemany('''
+        INSERT INTO daily_values(date, ticker, volume, investment, fee, price, fx, manual_value, value)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
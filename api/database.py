@@ -0,0 +1,149 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Sequence
+
+from metrics import Connection, Metrics
+
+
+class Database:
+    '''
+    Runs SQLite work off the event loop.
+
+    Reads go to a bounded thread pool where every worker thread owns its own
+    connection. All writes go through a single writer thread with one
+    connection, so they are serialized without any locking in handlers.
+    The database is switched to WAL mode so readers never wait for the writer.
+    Statements on all connections are reported to `metrics` when given.
+
+    Several server processes may share the database. Write transactions take the
+    write lock up front (`BEGIN IMMEDIATE`), wait for it up to `busy_timeout` and
+    are retried when another process holds it even longer. `version` follows
+    `PRAGMA data_version`, so it changes with commits of any process.
+    '''
+
+    def __init__(self, path: str, workers: int = 4, metrics: Metrics|None = None, busy_timeout: float = 5, write_retries: int = 3):
+        self.path = path
+        self.workers = workers
+        self.metrics = metrics
+        self.busy_timeout = busy_timeout
+        self.write_retries = write_retries
+        self._local = threading.local()
+        self._connections = []
+        self._readers = None
+        self._writer = None
+        self._write_conn = None
+        self._watch_conn = None
+        self._data_version = None
+        self._version = 0
+
+    def open(self):
+        '''Starts the threads and opens the connections of this process, does nothing when already open.'''
+        if self._writer is not None:
+            return
+        self._readers = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='db-read')
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-write')
+        self._writer.submit(self._writer_conn).result()
+        # only ever asked for the data version, from the event loop thread
+        self._watch_conn = sqlite3.connect(self.path, check_same_thread=False)
+
+    def close(self):
+        if self._writer is None:
+            return
+        self._readers.shutdown()
+        self._writer.shutdown()
+        for conn in self._connections + [self._watch_conn]:
+            conn.close()
+        self._local = threading.local()
+        self._connections = []
+        self._readers = self._writer = self._write_conn = self._watch_conn = None
+
+    @property
+    def version(self) -> int:
+        '''Changes after every committed write that changed something, made by any connection.'''
+        self.open()
+        data_version = self._watch_conn.execute('PRAGMA data_version').fetchone()[0]
+        if data_version != self._data_version:
+            self._data_version = data_version
+            self._version += 1
+        return self._version
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, factory=Connection)
+        conn.row_factory = sqlite3.Row
+        conn.metrics = self.metrics
+        conn.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout*1000)}')
+        self._connections.append(conn)
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            conn.execute('PRAGMA query_only = 1')
+        return conn
+
+    def _writer_conn(self) -> sqlite3.Connection:
+        if self._write_conn is None:
+            self._write_conn = self._connect()
+            # transactions are started explicitly
+            self._write_conn.isolation_level = None
+            self._write_conn.execute('PRAGMA journal_mode = WAL')
+            self._write_conn.execute('PRAGMA synchronous = NORMAL')
+        return self._write_conn
+
+    def _run_read(self, fn: Callable, args: tuple):
+        return fn(self._reader(), *args)
+
+    def _run_write(self, fn: Callable, args: tuple):
+        conn = self._writer_conn()
+        for attempt in range(self.write_retries + 1):
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                result = fn(conn, *args)
+                # `fn` may have ended the transaction itself, e.g. with executescript
+                if conn.in_transaction:
+                    conn.execute('COMMIT')
+                return result
+            except sqlite3.OperationalError as e:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                if e.sqlite_errorcode != sqlite3.SQLITE_BUSY or attempt == self.write_retries:
+                    raise
+                print("Database is locked, retrying the write", attempt + 1)
+                time.sleep(0.1*2**attempt)
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                raise
+
+    async def read(self, fn: Callable[..., Any], *args):
+        '''Calls `fn(connection, *args)` on a reader thread.'''
+        self.open()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, self._run_read, fn, args)
+
+    async def write(self, fn: Callable[..., Any], *args):
+        '''
+        Calls `fn(connection, *args)` on the writer thread inside one transaction.
+        `fn` may run again when the database stays locked by another process.
+        '''
+        self.open()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer, self._run_write, fn, args)
+
+    async def fetchall(self, sql: str, params: Sequence = ()) -> list[sqlite3.Row]:
+        return await self.read(lambda conn: conn.execute(sql, params).fetchall())
+
+    async def fetchone(self, sql: str, params: Sequence = ()) -> sqlite3.Row|None:
+        return await self.read(lambda conn: conn.execute(sql, params).fetchone())
+
+    async def execute(self, sql: str, params: Sequence = ()) -> int:
+        '''Executes a single write statement and returns the number of affected rows.'''
+        return await self.write(lambda conn: conn.execute(sql, params).rowcount)
+
+    async def executemany(self, sql: str, rows: Iterable[Sequence]) -> int:
+        rows = list(rows)
+        return await self.write(lambda conn: conn.executemany(sql, rows).rowcount)
@@ -0,0 +1,42 @@
+RESOLUTIONS = ('daily', 'weekly', 'monthly')
+
+# SQL expressions grouping ISO dates into periods, weeks start on Monday
+PERIOD_SQL = {
+    'weekly': "date(date, 'weekday 0', '-6 days')",
+    'monthly': 'substr(date, 1, 7)',
+}
+
+
+def lttb(values: list[float|None], threshold: int) -> list[int]:
+    '''
+    Largest-Triangle-Three-Buckets downsampling of an evenly spaced series.
+    Returns indices of at most `threshold` points keeping the shape of the line,
+    the first and the last point are always kept, so `threshold` is at least 2. NULLs count as zero.
+    '''
+    if threshold < 2:
+        raise ValueError(f'Cannot downsample to {threshold} points')
+    n = len(values)
+    if threshold >= n:
+        return list(range(n))
+    if threshold == 2:
+        return [0, n - 1]
+    ys = [v or 0 for v in values]
+    bucket = (n - 2)/(threshold - 2)
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i*bucket) + 1
+        end = int((i + 1)*bucket) + 1
+        # average of the next bucket is the third vertex of the triangle
+        next_start, next_end = end, min(int((i + 2)*bucket) + 1, n)
+        avg_x = (next_start + next_end - 1)/2
+        avg_y = sum(ys[next_start:next_end])/(next_end - next_start)
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((a - avg_x)*(ys[j] - ys[a]) - (a - j)*(avg_y - ys[a]))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return selected
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import sqlite3
+import time
+from typing import Iterable
+
+
+# rows of the change log kept for clients catching up after a reconnect
+KEEP_CHANGES = 1000
+# comment lines keep idle streams from being closed by proxies
+KEEPALIVE_SECONDS = 15
+
+
+def record(conn: sqlite3.Connection, tables: Iterable[str], tickers: Iterable[str] = ()):
+    '''
+    Logs changed tables and the instruments affected, in the transaction of the change,
+    so streams of every server process see it once it is committed.
+    '''
+    tables, tickers = sorted(set(tables)), sorted(set(tickers))
+    if not tables:
+        return
+    id = conn.execute(
+        'INSERT INTO data_changes(time, tables, tickers) VALUES (?, ?, ?)',
+        [time.time(), json.dumps(tables), json.dumps(tickers)],
+    ).lastrowid
+    conn.execute('DELETE FROM data_changes WHERE id <= ?', [id - KEEP_CHANGES])
+
+
+def last_change(conn: sqlite3.Connection) -> int:
+    return conn.execute('SELECT coalesce(max(id), 0) FROM data_changes').fetchone()[0]
+
+
+def changes_since(conn: sqlite3.Connection, id: int) -> dict|None:
+    '''
+    Tables and tickers changed after the change `id`, merged into one, None without changes.
+    `complete` is false when the log no longer reaches back to `id`.
+    '''
+    rows = conn.execute('SELECT id, tables, tickers FROM data_changes WHERE id > ? ORDER BY id', [id]).fetchall()
+    if not rows:
+        return None
+    first = conn.execute('SELECT min(id) FROM data_changes').fetchone()[0]
+    tables, tickers = set(), set()
+    for d in rows:
+        tables.update(json.loads(d['tables']))
+        tickers.update(json.loads(d['tickers']))
+    return {'id': rows[-1]['id'], 'tables': sorted(tables), 'tickers': sorted(tickers), 'complete': first <= id + 1}
+
+
+def message(event: str, data: dict, id: int|None = None) -> str:
+    '''A server-sent event.'''
+    lines = f'event: {event}\n'
+    if id is not None:
+        lines += f'id: {id}\n'
+    return lines + f'data: {json.dumps(data)}\n\n'
+
+
+class EventFeed:
+    '''
+    Server-sent events of data changes and job progress for all the streams of a process.
+    One task polls the data version (a cheap pragma) and the jobs every `interval` seconds
+    while a stream is open and broadcasts what changed:
+
+    - `data` with the changed `tables` and `tickers` after a commit of any server process,
+    - `job` with the job record whenever the progress of a job changes.
+    '''
+
+    def __init__(self, db, job_manager, interval: float = 0.5):
+        self.db = db
+        self.job_manager = job_manager
+        self.interval = interval
+        self.streams: set[asyncio.Queue] = set()
+        self._version = None
+        self._last_change = None
+        self._jobs = None
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue()
+        self.streams.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.streams.discard(queue)
+
+    def _broadcast(self, event: str):
+        for queue in self.streams:
+            queue.put_nowait(event)
+
+    async def run(self):
+        '''Polls while there are streams, meant to run as a server task.'''
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self.streams:
+                # started again from the current state by the next stream
+                self._last_change = None
+                self._jobs = None
+                continue
+            try:
+                await self.poll()
+            except Exception as e:
+                print("Failed to poll events", e)
+
+    async def _start(self) -> int:
+        '''Last change id, where polling starts when it isn't running yet.'''
+        if self._last_change is None:
+            self._version = self.db.version
+            self._last_change = await self.db.read(last_change)
+        return self._last_change
+
+    async def poll(self):
+        await self._start()
+        version = self.db.version
+        if version != self._version:
+            self._version = version
+            change = await self.db.read(changes_since, self._last_change)
+            if change is not None:
+                self._last_change = change['id']
+                self._broadcast(message('data', {**change, 'version': version}, change['id']))
+
+        jobs = {}
+        for job in await self.job_manager.list():
+            jobs[job['id']] = state = json.dumps(job)
+            # jobs that finished before the first poll are old news
+            if self._jobs is None and job['status'] != 'running':
+                continue
+            if state != (self._jobs or {}).get(job['id']):
+                self._broadcast(message('job', job))
+        self._jobs = jobs
+
+    async def stream(self, request, last_event_id: int|None = None):
+        '''Sends the events to a client until it disconnects, starting with the changes it missed.'''
+        response = await request.respond(
+            content_type='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        )
+        queue = self.subscribe()
+        try:
+            hello = {'version': self.db.version, 'id': await self._start()}
+            if last_event_id is not None:
+                change = await self.db.read(changes_since, last_event_id)
+                if change is not None:
+                    hello.update(change)
+                    hello['missed'] = True
+            await response.send(message('hello', hello, hello['id']))
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    event = ': keepalive\n\n'
+                await response.send(event)
+        finally:
+            self.unsubscribe(queue)
@@ -0,0 +1,181 @@
+import datetime
+import sqlite3
+
+import timeseries
+
+FIRST_DATE = '0000-00-00'
+
+# first and last date of all data, the daily rates cover this range
+RANGE_SQL = '''
+    SELECT min(first), max(last) FROM (
+        SELECT min(date) AS first, max(date) AS last FROM trades UNION ALL
+        SELECT date(min(day) + 2440587.5), date(max(day) + 2440587.5) FROM prices UNION ALL
+        SELECT date(min(day) + 2440587.5), date(max(day) + 2440587.5) FROM fx_prices UNION ALL
+        SELECT min(date), max(date) FROM manual_values
+    )
+'''
+
+
+def currencies(conn: sqlite3.Connection) -> set[str]:
+    '''Currencies of instruments and their dividends.'''
+    return {
+        d[0] for d in conn.execute('''
+            SELECT currency FROM instruments UNION
+            SELECT dividend_currency FROM instruments WHERE dividend_currency IS NOT NULL
+        ''')
+    }
+
+
+def pairs(conn: sqlite3.Connection, base_currency: str, pivot: str) -> list[tuple[str, str]]:
+    '''
+    Pairs to download: every currency against the pivot. Any other rate,
+    including the base currency ones, is a cross rate of two of them.
+    '''
+    return sorted((currency, pivot) for currency in currencies(conn) | {base_currency} if currency != pivot)
+
+
+def _stored_pairs(conn: sqlite3.Connection) -> set[tuple[str, str]]:
+    return {(d[0], d[1]) for d in conn.execute('''
+        SELECT fc.name, tc.name FROM (SELECT DISTINCT from_id, to_id FROM fx_prices) AS fp
+        JOIN currency_ids AS fc ON fc.id = fp.from_id
+        JOIN currency_ids AS tc ON tc.id = fp.to_id
+    ''')}
+
+
+def route(stored: set[tuple[str, str]], currency: str, base_currency: str) -> list[tuple[str, str, bool]]|None:
+    '''
+    Stored pairs multiplied to get the `currency` rate in `base_currency`, a direct
+    pair if there is one, otherwise through a common currency. Each leg is
+    `(from_curr, to_curr, inverted)`, None when the rate can't be derived.
+    '''
+    def leg(a, b):
+        if a == b:
+            return []
+        if (a, b) in stored:
+            return [(a, b, False)]
+        if (b, a) in stored:
+            return [(b, a, True)]
+        return None
+
+    direct = leg(currency, base_currency)
+    if direct is not None:
+        return direct
+    for pivot in sorted({c for pair in stored for c in pair}):
+        first, second = leg(currency, pivot), leg(pivot, base_currency)
+        if first is not None and second is not None:
+            return first + second
+    return None
+
+
+def _days(first: str, last: str) -> list[str]:
+    start = datetime.date.fromisoformat(first)
+    count = (datetime.date.fromisoformat(last) - start).days + 1
+    return [(start + datetime.timedelta(days=i)).isoformat() for i in range(count)]
+
+
+def _day_after(date: str) -> str:
+    return (datetime.date.fromisoformat(date) + datetime.timedelta(days=1)).isoformat()
+
+
+def update(conn: sqlite3.Connection, base_currency: str, changes: dict[str, str]) -> dict[str, str]:
+    '''
+    Recomputes the daily rates of currencies in `changes` (currency to the earliest
+    changed date) and returns the dates they were rewritten from.
+
+    `fx_daily` has a row for every calendar day of the data range, the rate is the last
+    one known on the day, before the first known rate the earliest one is used.
+    '''
+    first, last = conn.execute(RANGE_SQL).fetchone()
+    if first is None:
+        conn.execute('DELETE FROM fx_daily WHERE to_curr = ?', [base_currency])
+        return {}
+    stored = _stored_pairs(conn)
+    changed = {}
+    for currency, since in changes.items():
+        if currency == base_currency:
+            continue
+        since = max(since, first)
+        conn.execute('DELETE FROM fx_daily WHERE from_curr = ? AND to_curr = ? AND date >= ?', [currency, base_currency, since])
+        if since == first:
+            conn.execute('DELETE FROM fx_daily WHERE from_curr = ? AND to_curr = ?', [currency, base_currency])
+        changed[currency] = since
+        legs = route(stored, currency, base_currency)
+        if legs is None or since > last:
+            continue
+
+        series = []
+        for from_curr, to_curr, inverted in legs:
+            rows = conn.execute('''
+                SELECT date(day + 2440587.5), close FROM fx_prices
+                WHERE from_id = (SELECT id FROM currency_ids WHERE name = ?) AND to_id = (SELECT id FROM currency_ids WHERE name = ?)
+                AND close ORDER BY day
+            ''', [from_curr, to_curr]).fetchall()
+            series.append(([d[0] for d in rows], [1/d[1] if inverted else d[1] for d in rows]))
+        if not all(dates for dates, _ in series):
+            continue
+
+        # merge walk over every leg, each starting from its earliest rate
+        positions = [0]*len(series)
+        rows = []
+        for date in _days(since, last):
+            rate = 1.0
+            for i, (dates, rates) in enumerate(series):
+                while positions[i] + 1 < len(dates) and dates[positions[i] + 1] <= date:
+                    positions[i] += 1
+                rate *= rates[positions[i]]
+            rows.append((currency, base_currency, date, rate))
+        conn.executemany('INSERT INTO fx_daily(from_curr, to_curr, date, rate) VALUES (?, ?, ?, ?)', rows)
+    return changed
+
+
+def update_pairs(conn: sqlite3.Connection, base_currency: str, changes: dict[tuple[str, str], str]) -> dict[str, str]:
+    '''
+    Recomputes currencies derived from changed stored pairs,
+    `changes` maps `(from_curr, to_curr)` to the earliest changed date.
+    '''
+    stored = _stored_pairs(conn)
+    currencies_since = {}
+    for currency in currencies(conn):
+        for from_curr, to_curr, _ in route(stored, currency, base_currency) or []:
+            since = changes.get((from_curr, to_curr))
+            if since is not None:
+                currencies_since[currency] = min(currencies_since.get(currency, since), since)
+    return update(conn, base_currency, currencies_since)
+
+
+def prune(conn: sqlite3.Connection, keep: list[tuple[str, str]]) -> bool:
+    '''
+    Deletes stored pairs other than `keep` once all of them are stored,
+    returns whether any was deleted.
+    '''
+    stored = _stored_pairs(conn)
+    if not set(keep) <= stored:
+        return False
+    obsolete = stored - set(keep)
+    timeseries.delete_fx_pairs(conn, obsolete)
+    return bool(obsolete)
+
+
+def ensure(conn: sqlite3.Connection, base_currency: str) -> dict[str, str]:
+    '''
+    Extends the daily rates to new currencies and to the current data range,
+    returns the recomputed currencies like `update`.
+    '''
+    first, last = conn.execute(RANGE_SQL).fetchone()
+    if first is None:
+        return {}
+    present = {
+        d[0]: (d[1], d[2])
+        for d in conn.execute('SELECT from_curr, min(date), max(date) FROM fx_daily WHERE to_curr = ? GROUP BY from_curr', [base_currency])
+    }
+    stored = _stored_pairs(conn)
+    changes = {}
+    for currency in currencies(conn) - {base_currency}:
+        if currency not in present:
+            if route(stored, currency, base_currency) is not None:
+                changes[currency] = FIRST_DATE
+        elif present[currency][0] > first:
+            changes[currency] = FIRST_DATE
+        elif present[currency][1] < last:
+            changes[currency] = _day_after(present[currency][1])
+    return update(conn, base_currency, changes)
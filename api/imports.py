@@ -0,0 +1,126 @@
+import csv
+import datetime
+import io
+import sqlite3
+from typing import Callable, NamedTuple
+
+import sanic
+import sanic.exceptions
+
+import daily_values
+import events
+
+
+def _date(value) -> str:
+    return datetime.date.fromisoformat(str(value).strip()).isoformat()
+
+
+def _number(value) -> float|None:
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    return float(value)
+
+
+def _text(value) -> str:
+    return str(value).strip()
+
+
+class ImportSpec(NamedTuple):
+    '''
+    Bulk import of one table. `fields` are parsed in order and passed to `sql`,
+    `required` fields may not be empty. An optional `currency` column is checked
+    against the instrument column `currency_column`.
+    '''
+    fields: dict[str, Callable]
+    required: tuple[str, ...]
+    currency_column: str
+    sql: str
+    revalues: bool
+    table: str
+
+
+TRADES = ImportSpec(
+    fields={'date': _date, 'ticker': _text, 'volume': _number, 'price': _number, 'fee': _number, 'rate': _number},
+    required=('date', 'ticker', 'price'),
+    currency_column='currency',
+    sql='INSERT INTO trades(date, ticker, volume, price, fee, rate) VALUES (?, ?, ?, ?, ?, ?)',
+    revalues=True,
+    table='trades',
+)
+
+VALUES = ImportSpec(
+    fields={'date': _date, 'ticker': _text, 'value': _number},
+    required=('date', 'ticker', 'value'),
+    currency_column='currency',
+    sql='''
+        INSERT INTO manual_values(date, ticker, value) VALUES (?, ?, ?)
+        ON CONFLICT (date, ticker)
+        DO UPDATE SET value = excluded.value''',
+    revalues=True,
+    table='manual_values',
+)
+
+DIVIDENDS = ImportSpec(
+    fields={'date': _date, 'ticker': _text, 'dividend': _number},
+    required=('date', 'ticker', 'dividend'),
+    currency_column='dividend_currency',
+    sql='INSERT INTO dividends(date, ticker, dividend) VALUES (?, ?, ?)',
+    revalues=False,
+    table='dividends',
+)
+
+
+def parse_body(request: sanic.Request) -> list[dict]:
+    '''Rows of a CSV (with header) or JSON array body.'''
+    if request.content_type.startswith('text/csv'):
+        try:
+            text = request.body.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise sanic.exceptions.BadRequest('CSV body is not valid UTF-8')
+        return list(csv.DictReader(io.StringIO(text)))
+    data = request.json
+    if not isinstance(data, list) or not all(isinstance(d, dict) for d in data):
+        raise sanic.exceptions.BadRequest('Expected a JSON array of objects or text/csv')
+    return data
+
+
+def validate(conn: sqlite3.Connection, spec: ImportSpec, rows: list[dict]) -> tuple[list[tuple], list[dict]]:
+    '''Parses rows in one pass, returns insert parameters and errors with 1-based row numbers.'''
+    instruments = {
+        d['ticker']: d[spec.currency_column]
+        for d in conn.execute(f'SELECT ticker, {spec.currency_column} FROM instruments')
+    }
+    currencies = {d['name'] for d in conn.execute('SELECT name FROM currencies')}
+    records = []
+    errors = []
+    for i, row in enumerate(rows, start=1):
+        try:
+            missing = [f for f in spec.required if row.get(f) is None or str(row.get(f)).strip() == '']
+            if missing:
+                raise ValueError(f'missing {", ".join(missing)}')
+            record = tuple(parse(row.get(name)) if row.get(name) is not None else None for name, parse in spec.fields.items())
+            ticker = record[1]
+            if ticker not in instruments:
+                raise ValueError(f'unknown instrument {ticker}')
+            currency = row.get('currency')
+            if currency:
+                if currency not in currencies:
+                    raise ValueError(f'unknown currency {currency}')
+                if instruments[ticker] and currency != instruments[ticker]:
+                    raise ValueError(f'{ticker} is in {instruments[ticker]}, not {currency}')
+            records.append(record)
+        # TypeError for values of the wrong JSON type, e.g. a list as a number
+        except (TypeError, ValueError) as e:
+            errors.append({'row': i, 'error': str(e)})
+    return records, errors
+
+
+def insert(conn: sqlite3.Connection, spec: ImportSpec, records: list[tuple], base_currency: str):
+    conn.executemany(spec.sql, records)
+    events.record(conn, [spec.table], {record[1] for record in records})
+    if spec.revalues:
+        changes = {}
+        for record in records:
+            date, ticker = record[0], record[1]
+            changes[ticker] = min(changes.get(ticker, date), date)
+        daily_values.update(conn, base_currency, changes)
@@ -0,0 +1,247 @@
+import asyncio
+import json
+import secrets
+import sqlite3
+import time
+import traceback
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+
+class Job:
+    '''
+    A background task with its status and progress.
+    The job function receives the job and may fill in `progress` while it runs.
+    '''
+
+    def __init__(self, kind: str):
+        self.id = secrets.token_hex(8)
+        self.kind = kind
+        self.status = 'running'
+        self.started = time.time()
+        self.finished = None
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self._done = asyncio.Event()
+        self._task = None
+
+    async def wait(self) -> 'Job':
+        await self._done.wait()
+        return self
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'started': self.started,
+            'finished': self.finished,
+            'progress': self.progress,
+            'result': self.result,
+            'error': self.error,
+        }
+
+
+class JobStore:
+    '''
+    Job records shared by server processes. They are kept in a small database
+    of their own, so saving progress doesn't count as a change of the portfolio data.
+    A running job whose process stopped saving it for `stale_seconds` is failed.
+    '''
+
+    def __init__(self, path: str, stale_seconds: float = 30):
+        self.path = path
+        self.stale_seconds = stale_seconds
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA busy_timeout = 5000')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS jobs(
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                started REAL NOT NULL,
+                finished REAL,
+                progress TEXT,
+                result TEXT,
+                error TEXT,
+                heartbeat REAL NOT NULL
+            )
+        ''')
+        return conn
+
+    @staticmethod
+    def _record(row: sqlite3.Row) -> dict:
+        record = {k: row[k] for k in ('id', 'kind', 'status', 'started', 'finished', 'error')}
+        record['progress'] = json.loads(row['progress']) if row['progress'] else {}
+        record['result'] = json.loads(row['result']) if row['result'] else None
+        return record
+
+    def _save(self, conn: sqlite3.Connection, job: dict):
+        conn.execute('''
+            INSERT INTO jobs(id, kind, status, started, finished, progress, result, error, heartbeat)
+            VALUES (:id, :kind, :status, :started, :finished, :progress, :result, :error, :heartbeat)
+            ON CONFLICT (id) DO UPDATE SET
+                status = excluded.status, finished = excluded.finished, progress = excluded.progress,
+                result = excluded.result, error = excluded.error, heartbeat = excluded.heartbeat
+        ''', {
+            **job,
+            'progress': json.dumps(job['progress']),
+            'result': json.dumps(job['result']),
+            'heartbeat': time.time(),
+        })
+
+    def claim(self, job: dict, recent: float = 0) -> dict|None:
+        '''
+        Saves `job` unless a job of its kind is running, or started less than `recent`
+        seconds ago, in any process. Returns that job instead.
+        '''
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            now = time.time()
+            conn.execute('''
+                UPDATE jobs SET status = 'failed', error = 'The server process running the job stopped', finished = ?
+                WHERE status = 'running' AND heartbeat < ?
+            ''', [now, now - self.stale_seconds])
+            row = conn.execute('''
+                SELECT * FROM jobs WHERE kind = ? AND (status = 'running' OR started > ?)
+                ORDER BY started DESC LIMIT 1
+            ''', [job['kind'], now - recent]).fetchone()
+            if row is None:
+                self._save(conn, job)
+            conn.execute('COMMIT')
+            return self._record(row) if row is not None else None
+        finally:
+            conn.close()
+
+    def save(self, job: dict):
+        conn = self._connect()
+        try:
+            self._save(conn, job)
+        finally:
+            conn.close()
+
+    def get(self, job_id: str) -> dict|None:
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', [job_id]).fetchone()
+            return self._record(row) if row is not None else None
+        finally:
+            conn.close()
+
+    def list(self, limit: int) -> list[dict]:
+        conn = self._connect()
+        try:
+            return [self._record(row) for row in conn.execute('SELECT * FROM jobs ORDER BY started DESC LIMIT ?', [limit])]
+        finally:
+            conn.close()
+
+
+class RemoteJob:
+    '''A job running in another server process, followed through the store.'''
+
+    def __init__(self, record: dict, store: JobStore):
+        self._record = record
+        self._store = store
+
+    def __getattr__(self, name: str):
+        try:
+            return self._record[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    async def wait(self, interval: float = 0.5) -> 'RemoteJob':
+        while self._record['status'] == 'running':
+            await asyncio.sleep(interval)
+            self._record = await asyncio.to_thread(self._store.get, self._record['id']) or {
+                **self._record, 'status': 'failed', 'error': 'The job record is gone',
+            }
+        return self
+
+    def to_dict(self) -> dict:
+        return dict(self._record)
+
+
+class JobManager:
+    '''
+    Runs jobs in the background of the event loop. A job of a kind that is already
+    running is not started again, the running one is returned instead.
+    With a `store` this holds across server processes and the jobs of all of them are listed.
+    '''
+
+    def __init__(self, history: int = 50, store: JobStore|None = None):
+        self.history = history
+        self.store = store
+        self.jobs: OrderedDict[str, Job] = OrderedDict()
+        self.running: dict[str, Job] = {}
+
+    async def start(self, kind: str, fn: Callable[[Job], Awaitable[Any]], recent: float = 0) -> Job|RemoteJob:
+        '''Starts a job unless one of the kind is running or started less than `recent` seconds ago.'''
+        if kind in self.running:
+            return self.running[kind]
+        job = Job(kind)
+        if self.store is not None:
+            existing = await asyncio.to_thread(self.store.claim, job.to_dict(), recent)
+            if existing is not None:
+                local = self.jobs.get(existing['id'])
+                return local if local is not None else RemoteJob(existing, self.store)
+        elif recent:
+            for previous in reversed(self.jobs.values()):
+                if previous.kind == kind and previous.started > time.time() - recent:
+                    return previous
+        if kind in self.running:
+            return self.running[kind]
+        self.running[kind] = job
+        self.jobs[job.id] = job
+        while len(self.jobs) > self.history:
+            self.jobs.popitem(last=False)
+        job._task = asyncio.get_running_loop().create_task(self._run(job, fn))
+        return job
+
+    async def _heartbeat(self, job: Job, interval: float = 1):
+        '''Saves the progress of a running job.'''
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(self.store.save, job.to_dict())
+
+    async def _run(self, job: Job, fn: Callable[[Job], Awaitable[Any]]):
+        heartbeat = asyncio.get_running_loop().create_task(self._heartbeat(job)) if self.store is not None else None
+        try:
+            job.result = await fn(job)
+            job.status = 'done'
+        except Exception as e:
+            traceback.print_exc()
+            job.status = 'failed'
+            job.error = str(e)
+        finally:
+            job.finished = time.time()
+            del self.running[job.kind]
+            if heartbeat is not None:
+                heartbeat.cancel()
+                await asyncio.to_thread(self.store.save, job.to_dict())
+            job._done.set()
+
+    async def get(self, job_id: str) -> Job|RemoteJob|None:
+        job = self.jobs.get(job_id)
+        if job is None and self.store is not None:
+            record = await asyncio.to_thread(self.store.get, job_id)
+            job = RemoteJob(record, self.store) if record is not None else None
+        return job
+
+    async def list(self) -> list[dict]:
+        if self.store is not None:
+            return await asyncio.to_thread(self.store.list, self.history)
+        return [job.to_dict() for job in reversed(self.jobs.values())]
+
+    async def schedule(self, kind: str, fn: Callable[[Job], Awaitable[Any]], interval: float):
+        '''
+        Starts the job every `interval` seconds, meant to run as a server task.
+        With several server processes only one of them starts it each time.
+        '''
+        while True:
+            await asyncio.sleep(interval)
+            await self.start(kind, fn, recent=interval/2)
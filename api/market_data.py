@@ -0,0 +1,211 @@
+import csv
+import datetime
+import importlib
+import json
+import os
+import threading
+from typing import Callable, Iterable, NamedTuple
+
+
+class Bar(NamedTuple):
+    '''Daily data of an instrument or a currency pair.'''
+    date: str
+    open: float
+    high: float
+    low: float
+    close: float
+    dividends: float = 0
+    splits: float = 0
+
+
+class NotModified(Exception):
+    '''The source hasn't changed since the download its validators come from.'''
+
+
+class Provider:
+    '''
+    Source of daily bars from `start` up to, not including, `end` (open ended when None).
+    `param` is the instrument's `eval_param`, its meaning is up to the provider.
+    Bars may be produced lazily while they are downloaded.
+
+    A provider supporting conditional downloads keeps what identifies the downloaded
+    version in `validators`. They are passed back on the next download of the instrument,
+    which raises `NotModified` when the source is the same.
+    '''
+
+    def historical(self, ticker: str, param: str|None, start: datetime.date, end: datetime.date|None = None, validators: dict|None = None) -> Iterable[Bar]:
+        raise NotImplementedError
+
+    def fx(self, from_curr: str, to_curr: str, start: datetime.date, end: datetime.date|None = None) -> list[Bar]:
+        raise NotImplementedError(f'{type(self).__name__} has no fx rates')
+
+
+def _in_range(date: str, start: datetime.date, end: datetime.date|None) -> bool:
+    return date >= start.isoformat() and (end is None or date < end.isoformat())
+
+
+class YahooProvider(Provider):
+    '''Yahoo Finance through yfinance, `param` is the Yahoo symbol when it differs from the ticker.'''
+
+    fx_symbols = {
+        ('USD', 'CZK'): 'CZK=X',
+    }
+
+    def _history(self, symbol: str, start: datetime.date, end: datetime.date|None) -> list[Bar]:
+        # pulls in pandas, only paid for when an update runs
+        import yfinance
+        df = yfinance.Ticker(symbol).history(start=start, end=end)
+        return [
+            Bar(date.strftime('%Y-%m-%d'), row['Open'], row['High'], row['Low'], row['Close'], row.get('Dividends', 0), row.get('Stock Splits', 0))
+            for date, row in df.iterrows()
+        ]
+
+    def historical(self, ticker, param, start, end=None, validators=None):
+        return self._history(param or ticker, start, end)
+
+    def fx(self, from_curr, to_curr, start, end=None):
+        return self._history(self.fx_symbols.get((from_curr, to_curr), f'{from_curr}{to_curr}=X'), start, end)
+
+
+class HttpProvider(Provider):
+    '''
+    JSON list of daily objects, `param` is a JSON object with the `url`
+    and the keys of `date`, `open`, `high`, `low`, `close`, `dividends` and `stock_splits`.
+
+    Requests share one pooled session with timeouts and retries of failed connections
+    and server errors. Downloads are conditional on the ETag and Last-Modified
+    of the previous one. With ijson installed the list is parsed while it arrives.
+    '''
+
+    def __init__(self, timeout: float = 30, retries: int = 3, pool_size: int = 10):
+        self.timeout = timeout
+        self.retries = retries
+        self.pool_size = pool_size
+        self._session = None
+        self._lock = threading.Lock()
+
+    def session(self):
+        with self._lock:
+            if self._session is not None:
+                return self._session
+            import requests
+            import requests.adapters
+            import urllib3.util
+            retry = urllib3.util.Retry(
+                total=self.retries,
+                backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=('GET',),
+            )
+            adapter = requests.adapters.HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=retry)
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._session = session
+            return session
+
+    def historical(self, ticker, param, start, end=None, validators=None):
+        param = json.loads(param)
+        validators = validators if validators is not None else {}
+        headers = {}
+        if validators.get('url') == param['url']:
+            if validators.get('etag'):
+                headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                headers['If-Modified-Since'] = validators['last_modified']
+        with self.session().get(param['url'], headers=headers, timeout=self.timeout, stream=True) as resp:
+            if resp.status_code == 304:
+                raise NotModified(param['url'])
+            resp.raise_for_status()
+            date_key = param['date']
+            keys = [param.get(k) for k in ('open', 'high', 'low', 'close', 'dividends', 'stock_splits')]
+            for d in _json_items(resp):
+                if _in_range(d[date_key], start, end):
+                    yield Bar(d[date_key], *(d.get(k, 0) for k in keys))
+            validators.clear()
+            validators.update(url=param['url'], etag=resp.headers.get('ETag'), last_modified=resp.headers.get('Last-Modified'))
+
+
+def _json_items(resp) -> Iterable[dict]:
+    '''Items of a JSON list response, parsed incrementally when ijson is installed.'''
+    try:
+        import ijson
+    except ImportError:
+        yield from resp.json()
+        return
+    resp.raw.decode_content = True
+    yield from ijson.items(resp.raw, 'item', use_float=True)
+
+
+class FixtureProvider(Provider):
+    '''
+    Local files for offline updates and benchmarks, `<ticker>.csv` or `<ticker>.json`
+    for instruments and `<from>-<to>.csv` or `.json` for currency pairs in `directory`.
+    CSV files have a header, JSON files hold a list of objects, both with the `Bar` field names.
+    Missing fields are 0.
+    '''
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _read(self, name: str, start: datetime.date, end: datetime.date|None) -> list[Bar]:
+        path = os.path.join(self.directory, name)
+        if os.path.exists(path + '.csv'):
+            with open(path + '.csv', newline='') as f:
+                records = list(csv.DictReader(f))
+        elif os.path.exists(path + '.json'):
+            with open(path + '.json') as f:
+                records = json.load(f)
+        else:
+            raise FileNotFoundError(f'No fixture {path}.csv or {path}.json')
+        return [
+            Bar(d['date'], *(float(d.get(k) or 0) for k in Bar._fields[1:]))
+            for d in records
+            if _in_range(d['date'], start, end)
+        ]
+
+    def historical(self, ticker, param, start, end=None, validators=None):
+        return self._read(ticker, start, end)
+
+    def fx(self, from_curr, to_curr, start, end=None):
+        return self._read(f'{from_curr}-{to_curr}', start, end)
+
+
+class Registry:
+    '''
+    Providers by `instruments.evaluation`, created on first use. A factory is a callable
+    or a `'module:attribute'` string, so a provider module is only imported when needed.
+    With `fixtures` every evaluation reads from that directory instead.
+    '''
+
+    def __init__(self, factories: dict[str, Callable[[], Provider]|str]|None = None, fixtures: str|None = None):
+        self.factories = dict(factories if factories is not None else {
+            'yfinance': YahooProvider,
+            'http': HttpProvider,
+        })
+        self.fixtures = fixtures
+        self._providers = {}
+
+    def register(self, evaluation: str, factory: Callable[[], Provider]|str):
+        self.factories[evaluation] = factory
+        self._providers.pop(evaluation, None)
+
+    def get(self, evaluation: str) -> Provider|None:
+        '''Provider of the evaluation, None when its data isn't downloaded (e.g. manual values).'''
+        if evaluation not in self.factories:
+            return None
+        if self.fixtures is not None:
+            evaluation = 'fixture'
+        provider = self._providers.get(evaluation)
+        if provider is None:
+            provider = self._providers[evaluation] = self._create(evaluation)
+        return provider
+
+    def _create(self, evaluation: str) -> Provider:
+        if evaluation == 'fixture':
+            return FixtureProvider(self.fixtures)
+        factory = self.factories[evaluation]
+        if isinstance(factory, str):
+            module, attribute = factory.split(':')
+            factory = getattr(importlib.import_module(module), attribute)
+        return factory()
@@ -0,0 +1,271 @@
+import bisect
+import collections
+import functools
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Sequence
+
+# upper bounds of histogram buckets, the last bucket is unbounded
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+
+# statements worth an EXPLAIN QUERY PLAN
+EXPLAINED = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+class Histogram:
+    '''Counts observations into cumulative buckets like a Prometheus histogram.'''
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0]*(len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append(('+Inf' if bound == float('inf') else repr(bound), total))
+        return result
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'max': self.max,
+            'buckets': dict(self.cumulative()),
+        }
+
+
+@functools.lru_cache(maxsize=1024)
+def statement_id(sql: str) -> tuple[str, str]:
+    '''Short stable id of a statement and its text with collapsed whitespace.'''
+    text = ' '.join(sql.split())
+    return hashlib.sha1(text.encode()).hexdigest()[:10], text
+
+
+def _label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    '''
+    Latency histograms of SQL statements and HTTP routes.
+
+    Statements are identified by a hash of their text. Those slower than
+    `slow_query_ms` are printed and kept in a short log together with their
+    query plan, with `explain` the plan of every statement is captured once.
+    '''
+
+    def __init__(self, slow_query_ms: float = 0, explain: bool = False, slow_log: int = 100):
+        self.slow_query_ms = slow_query_ms
+        self.explain = explain
+        self.statements: dict[str, dict] = {}
+        self.routes: dict[str, Histogram] = {}
+        self.slow_queries = collections.deque(maxlen=slow_log)
+        self._lock = threading.Lock()
+
+    def _plan(self, conn: sqlite3.Connection, sql: str, parameters: Sequence) -> list[str]|None:
+        if parameters is None or not sql.lstrip()[:7].upper().startswith(EXPLAINED):
+            return None
+        try:
+            # a plain cursor, so the EXPLAIN is not measured itself
+            cursor = sqlite3.Cursor(conn)
+            cursor.row_factory = None
+            return [row[3] for row in cursor.execute(f'EXPLAIN QUERY PLAN {sql}', parameters)]
+        except sqlite3.Error:
+            return None
+
+    def observe_query(self, conn: sqlite3.Connection, sql: str, parameters: Sequence|None, seconds: float, rows: int):
+        id, text = statement_id(sql)
+        slow = self.slow_query_ms and seconds*1000 >= self.slow_query_ms
+        with self._lock:
+            statement = self.statements.get(id)
+            if statement is None:
+                statement = self.statements[id] = {
+                    'sql': text,
+                    'plan': None,
+                    'duration': Histogram(DURATION_BUCKETS),
+                    'rows': Histogram(ROW_BUCKETS),
+                }
+            statement['duration'].observe(seconds)
+            statement['rows'].observe(rows)
+            need_plan = statement['plan'] is None and (self.explain or slow)
+        if need_plan:
+            statement['plan'] = self._plan(conn, sql, parameters)
+        if slow:
+            print(f'Slow query {id} {seconds*1000:.1f} ms, {rows} rows: {text[:200]}')
+            if statement['plan']:
+                print('  plan:', '; '.join(statement['plan']))
+            self.slow_queries.append({
+                'id': id,
+                'time': time.time(),
+                'ms': round(seconds*1000, 3),
+                'rows': rows,
+            })
+
+    def observe_request(self, route: str, seconds: float):
+        with self._lock:
+            histogram = self.routes.get(route)
+            if histogram is None:
+                histogram = self.routes[route] = Histogram(DURATION_BUCKETS)
+            histogram.observe(seconds)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                'requests': {route: h.to_dict() for route, h in self.routes.items()},
+                'queries': {
+                    id: {
+                        'sql': s['sql'],
+                        'plan': s['plan'],
+                        'duration': s['duration'].to_dict(),
+                        'rows': s['rows'].to_dict(),
+                    }
+                    for id, s in self.statements.items()
+                },
+                'slow_queries': list(self.slow_queries),
+            }
+
+    def to_prometheus(self) -> str:
+        lines = []
+
+        def histogram(name: str, help: str, label: str, histograms: dict[str, Histogram]):
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} histogram')
+            for key, h in histograms.items():
+                labels = f'{label}="{_label(key)}"'
+                for bound, count in h.cumulative():
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{name}_sum{{{labels}}} {h.sum!r}')
+                lines.append(f'{name}_count{{{labels}}} {h.count}')
+
+        with self._lock:
+            histogram('portfolio_request_duration_seconds', 'HTTP request latency by route.', 'route', self.routes)
+            histogram('portfolio_query_duration_seconds', 'SQL statement time until its rows were consumed.', 'statement',
+                      {id: s['duration'] for id, s in self.statements.items()})
+            histogram('portfolio_query_rows', 'Rows returned or changed by a SQL statement.', 'statement',
+                      {id: s['rows'] for id, s in self.statements.items()})
+        return '\n'.join(lines) + '\n'
+
+
+class Cursor(sqlite3.Cursor):
+    '''
+    Cursor reporting every statement to the connection's metrics. The time
+    includes fetching, a statement is reported once its rows are consumed,
+    the next statement starts or the cursor goes away.
+    '''
+    _sql = None
+
+    def _start(self, sql: str, parameters: Sequence|None, started: float):
+        self._sql = sql
+        self._parameters = parameters
+        self._seconds = time.perf_counter() - started
+        self._rows = 0
+        self._query = self.description is not None
+        if not self._query:
+            self._finish()
+
+    def _finish(self):
+        sql = self._sql
+        if sql is None:
+            return
+        self._sql = None
+        metrics = getattr(self.connection, 'metrics', None)
+        if metrics is not None:
+            rows = self._rows if self._query else max(self.rowcount, 0)
+            metrics.observe_query(self.connection, sql, self._parameters, self._seconds, rows)
+
+    def execute(self, sql: str, parameters: Sequence = ()):
+        self._finish()
+        started = time.perf_counter()
+        super().execute(sql, parameters)
+        self._start(sql, parameters, started)
+        return self
+
+    def executemany(self, sql: str, seq_of_parameters):
+        self._finish()
+        started = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        self._start(sql, None, started)
+        return self
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        if self._sql is not None:
+            self._seconds += time.perf_counter() - started
+            if row is None:
+                self._finish()
+            else:
+                self._rows += 1
+        return row
+
+    def fetchmany(self, size: int|None = None):
+        size = self.arraysize if size is None else size
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        if self._sql is not None:
+            self._seconds += time.perf_counter() - started
+            self._rows += len(rows)
+            if len(rows) < size:
+                self._finish()
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        if self._sql is not None:
+            self._seconds += time.perf_counter() - started
+            self._rows += len(rows)
+            self._finish()
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            if self._sql is not None:
+                self._seconds += time.perf_counter() - started
+                self._finish()
+            raise
+        if self._sql is not None:
+            self._seconds += time.perf_counter() - started
+            self._rows += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+class Connection(sqlite3.Connection):
+    '''Connection whose cursors report to `metrics` when it is set.'''
+    metrics: Metrics|None = None
+
+    def cursor(self, factory=Cursor):
+        return super().cursor(factory)
+
+    def execute(self, sql: str, parameters: Sequence = ()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
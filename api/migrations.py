@@ -0,0 +1,238 @@
+import sqlite3
+
+
+# Numbered schema changes applied on top of `database.sql`.
+# The last applied number is kept in `PRAGMA user_version`, never renumber or edit applied entries.
+MIGRATIONS = [
+    (1, 'daily values', '''
+        CREATE TABLE IF NOT EXISTS daily_values(
+            date TEXT NOT NULL,
+            ticker TEXT NOT NULL,
+            volume REAL,
+            investment REAL,
+            fee REAL,
+            price REAL,
+            fx REAL,
+            manual_value REAL,
+            value REAL,
+            PRIMARY KEY(ticker, date),
+            FOREIGN KEY(ticker) REFERENCES instruments(ticker)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS daily_values_date ON daily_values(date);
+    '''),
+    (2, 'as-of lookup indexes', '''
+        CREATE INDEX IF NOT EXISTS trades_ticker_date ON trades(ticker, date, volume, price, fee, rate);
+        CREATE INDEX IF NOT EXISTS historical_ticker_date ON historical(ticker, date, close);
+        CREATE INDEX IF NOT EXISTS historical_dividends ON historical(ticker, date, dividends) WHERE dividends > 0;
+        CREATE INDEX IF NOT EXISTS fx_pair_date ON fx(from_curr, to_curr, date, close);
+        CREATE INDEX IF NOT EXISTS manual_values_ticker_date ON manual_values(ticker, date, value);
+    '''),
+    (3, 'daily fx rates', '''
+        CREATE TABLE IF NOT EXISTS fx_daily(
+            from_curr TEXT NOT NULL,
+            to_curr TEXT NOT NULL,
+            date TEXT NOT NULL,
+            rate REAL NOT NULL,
+            PRIMARY KEY(from_curr, to_curr, date)
+        ) WITHOUT ROWID;
+    '''),
+    (4, 'position ledger', '''
+        CREATE TABLE IF NOT EXISTS positions(
+            ticker TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            volume REAL NOT NULL,
+            PRIMARY KEY(ticker, start_date),
+            FOREIGN KEY(ticker) REFERENCES instruments(ticker)
+        ) WITHOUT ROWID;
+    '''),
+    (5, 'feed validators', '''
+        CREATE TABLE IF NOT EXISTS feed_validators(
+            ticker TEXT PRIMARY KEY,
+            validators TEXT NOT NULL,
+            FOREIGN KEY(ticker) REFERENCES instruments(ticker)
+        );
+    '''),
+    (6, 'data change log', '''
+        CREATE TABLE IF NOT EXISTS data_changes(
+            id INTEGER PRIMARY KEY,
+            time REAL NOT NULL,
+            tables TEXT NOT NULL,
+            tickers TEXT NOT NULL
+        );
+    '''),
+    # see timeseries.py, the views keep the original tables readable and writable
+    (7, 'compact price and fx series', '''
+        CREATE TABLE IF NOT EXISTS instrument_ids(
+            id INTEGER PRIMARY KEY,
+            ticker TEXT NOT NULL UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS currency_ids(
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        );
+        INSERT OR IGNORE INTO instrument_ids(ticker)
+            SELECT ticker FROM instruments UNION SELECT ticker FROM historical ORDER BY 1;
+        INSERT OR IGNORE INTO currency_ids(name)
+            SELECT name FROM currencies UNION SELECT from_curr FROM fx UNION SELECT to_curr FROM fx ORDER BY 1;
+
+        CREATE TABLE prices(
+            instrument INTEGER NOT NULL,
+            day INTEGER NOT NULL,
+            close REAL,
+            dividends REAL,
+            splits REAL,
+            PRIMARY KEY(instrument, day)
+        ) WITHOUT ROWID;
+        CREATE INDEX prices_day ON prices(day);
+        CREATE INDEX prices_dividends ON prices(instrument, day, dividends) WHERE dividends > 0;
+        CREATE TABLE prices_ohlc(
+            instrument INTEGER NOT NULL,
+            day INTEGER NOT NULL,
+            open REAL,
+            high REAL,
+            low REAL,
+            PRIMARY KEY(instrument, day)
+        ) WITHOUT ROWID;
+        CREATE TABLE fx_prices(
+            from_id INTEGER NOT NULL,
+            to_id INTEGER NOT NULL,
+            day INTEGER NOT NULL,
+            close REAL,
+            PRIMARY KEY(from_id, to_id, day)
+        ) WITHOUT ROWID;
+        CREATE INDEX fx_prices_day ON fx_prices(day);
+        CREATE TABLE fx_prices_ohlc(
+            from_id INTEGER NOT NULL,
+            to_id INTEGER NOT NULL,
+            day INTEGER NOT NULL,
+            open REAL,
+            high REAL,
+            low REAL,
+            PRIMARY KEY(from_id, to_id, day)
+        ) WITHOUT ROWID;
+
+        INSERT INTO prices(instrument, day, close, dividends, splits)
+            SELECT ii.id, CAST(julianday(ht.date) - 2440587.5 AS INTEGER), ht.close, ht.dividends, ht.splits
+            FROM historical AS ht JOIN instrument_ids AS ii ON ii.ticker = ht.ticker
+            WHERE julianday(ht.date) IS NOT NULL ORDER BY 1, 2;
+        INSERT INTO prices_ohlc(instrument, day, open, high, low)
+            SELECT ii.id, CAST(julianday(ht.date) - 2440587.5 AS INTEGER), ht.open, ht.high, ht.low
+            FROM historical AS ht JOIN instrument_ids AS ii ON ii.ticker = ht.ticker
+            WHERE julianday(ht.date) IS NOT NULL AND coalesce(ht.open, ht.high, ht.low) IS NOT NULL ORDER BY 1, 2;
+        INSERT INTO fx_prices(from_id, to_id, day, close)
+            SELECT fc.id, tc.id, CAST(julianday(fx.date) - 2440587.5 AS INTEGER), fx.close
+            FROM fx JOIN currency_ids AS fc ON fc.name = fx.from_curr JOIN currency_ids AS tc ON tc.name = fx.to_curr
+            WHERE julianday(fx.date) IS NOT NULL ORDER BY 1, 2, 3;
+        INSERT INTO fx_prices_ohlc(from_id, to_id, day, open, high, low)
+            SELECT fc.id, tc.id, CAST(julianday(fx.date) - 2440587.5 AS INTEGER), fx.open, fx.high, fx.low
+            FROM fx JOIN currency_ids AS fc ON fc.name = fx.from_curr JOIN currency_ids AS tc ON tc.name = fx.to_curr
+            WHERE julianday(fx.date) IS NOT NULL AND coalesce(fx.open, fx.high, fx.low) IS NOT NULL ORDER BY 1, 2, 3;
+
+        DROP INDEX IF EXISTS historical_ticker_date;
+        DROP INDEX IF EXISTS historical_dividends;
+        DROP INDEX IF EXISTS fx_pair_date;
+        DROP TABLE historical;
+        DROP TABLE fx;
+
+        CREATE VIEW historical AS
+            SELECT
+                date(pt.day + 2440587.5) AS date, ii.ticker, po.open, po.high, po.low, pt.close, pt.dividends, pt.splits
+            FROM prices AS pt
+            JOIN instrument_ids AS ii ON ii.id = pt.instrument
+            LEFT JOIN prices_ohlc AS po ON po.instrument = pt.instrument AND po.day = pt.day;
+        CREATE TRIGGER historical_insert INSTEAD OF INSERT ON historical
+        BEGIN
+            INSERT OR IGNORE INTO instrument_ids(ticker) VALUES (new.ticker);
+            INSERT OR REPLACE INTO prices(instrument, day, close, dividends, splits) VALUES (
+                (SELECT id FROM instrument_ids WHERE ticker = new.ticker),
+                CAST(julianday(new.date) - 2440587.5 AS INTEGER), new.close, new.dividends, new.splits
+            );
+            DELETE FROM prices_ohlc
+                WHERE instrument = (SELECT id FROM instrument_ids WHERE ticker = new.ticker)
+                AND day = CAST(julianday(new.date) - 2440587.5 AS INTEGER);
+            INSERT OR REPLACE INTO prices_ohlc(instrument, day, open, high, low)
+                SELECT id, CAST(julianday(new.date) - 2440587.5 AS INTEGER), new.open, new.high, new.low
+                FROM instrument_ids WHERE ticker = new.ticker AND coalesce(new.open, new.high, new.low) IS NOT NULL;
+        END;
+
+        CREATE VIEW fx AS
+            SELECT
+                date(fp.day + 2440587.5) AS date, fc.name AS from_curr, tc.name AS to_curr, fo.open, fo.high, fo.low, fp.close
+            FROM fx_prices AS fp
+            JOIN currency_ids AS fc ON fc.id = fp.from_id
+            JOIN currency_ids AS tc ON tc.id = fp.to_id
+            LEFT JOIN fx_prices_ohlc AS fo ON fo.from_id = fp.from_id AND fo.to_id = fp.to_id AND fo.day = fp.day;
+        CREATE TRIGGER fx_insert INSTEAD OF INSERT ON fx
+        BEGIN
+            INSERT OR IGNORE INTO currency_ids(name) VALUES (new.from_curr), (new.to_curr);
+            INSERT OR REPLACE INTO fx_prices(from_id, to_id, day, close) VALUES (
+                (SELECT id FROM currency_ids WHERE name = new.from_curr),
+                (SELECT id FROM currency_ids WHERE name = new.to_curr),
+                CAST(julianday(new.date) - 2440587.5 AS INTEGER), new.close
+            );
+            DELETE FROM fx_prices_ohlc
+                WHERE from_id = (SELECT id FROM currency_ids WHERE name = new.from_curr)
+                AND to_id = (SELECT id FROM currency_ids WHERE name = new.to_curr)
+                AND day = CAST(julianday(new.date) - 2440587.5 AS INTEGER);
+            INSERT OR REPLACE INTO fx_prices_ohlc(from_id, to_id, day, open, high, low)
+                SELECT fc.id, tc.id, CAST(julianday(new.date) - 2440587.5 AS INTEGER), new.open, new.high, new.low
+                FROM currency_ids AS fc, currency_ids AS tc
+                WHERE fc.name = new.from_curr AND tc.name = new.to_curr AND coalesce(new.open, new.high, new.low) IS NOT NULL;
+        END;
+    '''),
+]
+
+# Representative lookups of the valuation queries, they all have to be served by an index.
+HOT_QUERIES = {
+    'last price': ('SELECT close FROM prices WHERE instrument = ? AND day <= ? ORDER BY day DESC LIMIT 1', [0, 0]),
+    'prices by day': ('SELECT DISTINCT day FROM prices WHERE day >= ?', [0]),
+    'last fx rate': ('SELECT close FROM fx_prices WHERE from_id = ? AND to_id = ? AND day <= ? ORDER BY day DESC LIMIT 1', [0, 0, 0]),
+    'daily fx rate': ('SELECT rate FROM fx_daily WHERE from_curr = ? AND to_curr = ? AND date = ?', ['', '', '']),
+    'last manual value': ('SELECT date, value FROM manual_values WHERE ticker = ? AND date <= ? ORDER BY date DESC LIMIT 1', ['', '']),
+    'cumulative trades': ('SELECT sum(volume), sum(price*volume), sum(fee) FROM trades WHERE ticker = ? AND date <= ?', ['', '']),
+    'dividends': ('SELECT instrument, day, dividends FROM prices WHERE dividends > 0', []),
+    'holding interval': ('SELECT volume FROM positions WHERE ticker = ? AND start_date <= ? ORDER BY start_date DESC LIMIT 1', ['', '']),
+    'daily values': ('SELECT date, value FROM daily_values WHERE ticker = ? AND date >= ?', ['', '']),
+}
+
+
+def _statements(sql: str):
+    statement = ''
+    for line in sql.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement
+            statement = ''
+    if statement.strip():
+        yield statement
+
+
+def migrate(conn: sqlite3.Connection) -> list[int]:
+    '''
+    Applies pending migrations in the current transaction. Returns applied numbers.
+    Run in a write transaction, a concurrently starting process waits and then finds them applied.
+    '''
+    current = conn.execute('PRAGMA user_version').fetchone()[0]
+    applied = []
+    for version, name, sql in MIGRATIONS:
+        if version <= current:
+            continue
+        print("Applying migration", version, name)
+        for statement in _statements(sql):
+            conn.execute(statement)
+        conn.execute(f'PRAGMA user_version = {version}')
+        applied.append(version)
+    return applied
+
+
+def check_query_plans(conn: sqlite3.Connection) -> dict[str, list[str]]:
+    '''Reports hot queries whose plan contains a full table scan.'''
+    scans = {}
+    for name, (sql, params) in HOT_QUERIES.items():
+        details = [d['detail'] for d in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+        full = [d for d in details if d.startswith('SCAN ') and 'USING' not in d]
+        if full:
+            print("Full table scan in query", name, full)
+            scans[name] = full
+    return scans
@@ -0,0 +1,136 @@
+import base64
+import datetime
+import json
+import sqlite3
+from typing import Callable, NamedTuple
+
+import sanic
+import sanic.exceptions
+
+import responses
+from database import Database
+
+
+# rows fetched per round trip when streaming
+STREAM_BATCH = 1000
+
+
+class ListQuery(NamedTuple):
+    '''
+    Listing of a table ordered by a unique key.
+    `columns` maps output names to SQL expressions, `key` names the ordering columns.
+    `stored` gives the SQL expression and the conversion of listed values of columns
+    that are stored in another form, e.g. a date kept as a day number, so that
+    ordering and range conditions use the stored column and its index.
+    '''
+    columns: dict[str, str]
+    source: str
+    key: tuple[str, ...]
+    descending: bool = False
+    stored: dict[str, tuple[str, Callable]] = {}
+
+    def condition(self, name: str) -> tuple[str, Callable]:
+        '''SQL expression and value conversion for comparisons with the column `name`.'''
+        return self.stored.get(name, (self.columns[name], lambda value: value))
+
+
+def encode_cursor(values: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise sanic.exceptions.BadRequest('Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise sanic.exceptions.BadRequest('Invalid cursor')
+    return values
+
+
+def fetch_page(conn: sqlite3.Connection, query: ListQuery, names: list[str], where: list[str], params: list, after: list|None, limit: int|None):
+    '''
+    Returns rows following the `after` key as tuples of `names` and the key of the last row,
+    the key is None when there are no more rows.
+    '''
+    where = list(where)
+    params = list(params)
+    conditions = [query.condition(k) for k in query.key]
+    if after is not None:
+        keys = ', '.join(expression for expression, _ in conditions)
+        where.append(f'({keys}) {"<" if query.descending else ">"} ({", ".join("?" for _ in query.key)})')
+        params += [convert(value) for (_, convert), value in zip(conditions, after)]
+    order = ', '.join(f'{expression} {"DESC" if query.descending else "ASC"}' for expression, _ in conditions)
+    sql = f'''
+        SELECT {', '.join(f'{query.columns[n]} AS "{n}"' for n in names)}, {', '.join(query.columns[k] for k in query.key)}
+        FROM {query.source}
+        {f'WHERE {" AND ".join(where)}' if where else ''}
+        ORDER BY {order}
+        {'LIMIT ?' if limit else ''}
+    '''
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    rows = cursor.execute(sql, params + ([limit + 1] if limit else [])).fetchall()
+    more = limit is not None and len(rows) > limit
+    rows = rows[:limit] if more else rows
+    return (
+        [row[:len(names)] for row in rows],
+        list(rows[-1][len(names):]) if more else None,
+    )
+
+
+async def respond(request: sanic.Request, db: Database, query: ListQuery, where: list[str], params: list):
+    '''
+    Lists `query` rows with keyset pagination.
+
+    Query arguments: `columns` (comma separated projection), `from` and `to` (date range),
+    `limit` and `cursor` (the `X-Next-Cursor` header of the previous page) and `format`:
+    `columns` for column lists, `ndjson` streams all the rows (from `cursor` on) as they are read,
+    it takes no `limit` since a stream has no header for the next cursor. Streaming reads keyset
+    batches, so no database cursor is held between writes to the socket and memory stays flat.
+    '''
+    names = request.args.get('columns', '').split(',') if request.args.get('columns') else list(query.columns)
+    unknown = [n for n in names if n not in query.columns]
+    if unknown:
+        raise sanic.exceptions.BadRequest(f'Unknown columns {", ".join(unknown)}')
+    where = list(where)
+    params = list(params)
+    date, convert = query.condition('date')
+    for name, operator in (('from', '>='), ('to', '<=')):
+        if request.args.get(name):
+            try:
+                value = datetime.date.fromisoformat(request.args.get(name)).isoformat()
+            except ValueError:
+                raise sanic.exceptions.BadRequest(f'Invalid {name} date')
+            where.append(f'{date} {operator} ?')
+            params.append(convert(value))
+    try:
+        limit = int(request.args['limit'][0]) if 'limit' in request.args else None
+    except ValueError:
+        raise sanic.exceptions.BadRequest('Invalid limit')
+    if limit is not None and limit < 1:
+        raise sanic.exceptions.BadRequest('Invalid limit')
+    streamed = request.args.get('format') == 'ndjson'
+    if streamed and limit is not None:
+        raise sanic.exceptions.BadRequest('Streamed listings take no limit')
+    after = decode_cursor(request.args.get('cursor'), len(query.key)) if request.args.get('cursor') else None
+    try:
+        for name, value in zip(query.key, after or []):
+            query.condition(name)[1](value)
+    except (TypeError, ValueError):
+        raise sanic.exceptions.BadRequest('Invalid cursor')
+
+    if streamed:
+        response = await request.respond(content_type='application/x-ndjson')
+        while True:
+            rows, after = await db.read(fetch_page, query, names, where, params, after, STREAM_BATCH)
+            if rows:
+                await response.send(b''.join(responses.dumps(dict(zip(names, row))) + b'\n' for row in rows))
+            if after is None:
+                break
+        await response.eof()
+        return None
+
+    rows, after = await db.read(fetch_page, query, names, where, params, after, limit)
+    headers = {'X-Next-Cursor': encode_cursor(after)} if after is not None else {}
+    return responses.table(request, responses.columns(rows, names), headers=headers)
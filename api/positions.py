@@ -0,0 +1,56 @@
+import sqlite3
+
+import timeseries
+
+# end of the interval that is still open
+OPEN_END = '9999-12-31'
+
+
+def update(conn: sqlite3.Connection, changes: dict[str, str]):
+    '''
+    Rewrites holding intervals of changed instruments.
+    `changes` maps ticker to the earliest date with changed trades or splits.
+
+    Every interval has a constant volume from `start_date` up to, not including, `end_date`.
+    A split multiplies the volume held before its date, trades of the split day are
+    taken as made in the new shares. Instruments traded without volume have no intervals.
+    '''
+    for ticker, since in changes.items():
+        _recompute(conn, ticker, since)
+
+
+def _recompute(conn: sqlite3.Connection, ticker: str, since: str):
+    previous = conn.execute('''
+        SELECT start_date, volume FROM positions WHERE ticker = ? AND start_date < ? ORDER BY start_date DESC LIMIT 1
+    ''', [ticker, since]).fetchone()
+    conn.execute('DELETE FROM positions WHERE ticker = ? AND start_date >= ?', [ticker, since])
+    volume = previous[1] if previous else None
+
+    trades = conn.execute('''
+        SELECT date, sum(volume) FROM trades WHERE ticker = ? AND date >= ? AND volume IS NOT NULL GROUP BY date
+    ''', [ticker, since]).fetchall()
+    splits = dict(conn.execute('''
+        SELECT date(pt.day + 2440587.5), pt.splits FROM prices AS pt
+        JOIN instrument_ids AS ii ON ii.id = pt.instrument
+        WHERE ii.ticker = ? AND pt.day >= ? AND pt.splits > 0 AND pt.splits != 1
+    ''', [ticker, timeseries.day(since)]).fetchall())
+    traded = dict(trades)
+
+    rows = []
+    for date in sorted(traded.keys() | splits.keys()):
+        new_volume = volume
+        if date in splits and new_volume is not None:
+            new_volume *= splits[date]
+        if date in traded:
+            new_volume = (new_volume or 0) + traded[date]
+        if new_volume == volume:
+            continue
+        if rows:
+            rows[-1][2] = date
+        elif previous:
+            conn.execute('UPDATE positions SET end_date = ? WHERE ticker = ? AND start_date = ?', [date, ticker, previous[0]])
+        rows.append([ticker, date, OPEN_END, new_volume])
+        volume = new_volume
+    if previous and not rows:
+        conn.execute('UPDATE positions SET end_date = ? WHERE ticker = ? AND start_date = ?', [OPEN_END, ticker, previous[0]])
+    conn.executemany('INSERT INTO positions(ticker, start_date, end_date, volume) VALUES (?, ?, ?, ?)', rows)
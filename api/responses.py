@@ -0,0 +1,105 @@
+import gzip
+import json
+from typing import Iterable, Sequence
+
+import sanic
+import sanic.exceptions
+import sanic.response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# smaller bodies don't get noticeably smaller
+MIN_COMPRESS_BYTES = 1024
+# fast levels, numeric JSON compresses well anyway and cached bodies are compressed once
+GZIP_LEVEL = 1
+BROTLI_QUALITY = 4
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'application/javascript', 'text/')
+
+
+def dumps(obj) -> bytes:
+    '''JSON with orjson when installed, dict keys may be numbers like with the json module.'''
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj).encode()
+
+
+def columnar(request: sanic.Request) -> bool:
+    '''Whether the client asked for `format=columns`.'''
+    format = request.args.get('format')
+    if format not in (None, 'columns'):
+        raise sanic.exceptions.BadRequest(f'Unknown format {format}')
+    return format == 'columns'
+
+
+def columns(rows: Iterable[Sequence], names: Sequence[str]) -> dict[str, list]:
+    '''Column lists of rows given as sequences in the order of `names`.'''
+    values = list(zip(*rows))
+    return {name: list(values[i]) if values else [] for i, name in enumerate(names)}
+
+
+def table(request: sanic.Request, data: dict[str, list], headers: dict|None = None) -> sanic.HTTPResponse:
+    '''
+    Column lists as they are with `format=columns`, otherwise as a list of row objects.
+    Columns name every field once instead of on every row.
+    '''
+    if columnar(request):
+        return sanic.response.json(data, headers=headers)
+    names = list(data)
+    return sanic.response.json([dict(zip(names, row)) for row in zip(*data.values())], headers=headers)
+
+
+def rows(request: sanic.Request, rows: list[dict], headers: dict|None = None) -> sanic.HTTPResponse:
+    '''Row objects, with `format=columns` as column lists like `table`.'''
+    if columnar(request):
+        names = list(rows[0]) if rows else []
+        return sanic.response.json({name: [row[name] for row in rows] for name in names}, headers=headers)
+    return sanic.response.json(rows, headers=headers)
+
+
+def negotiate(request: sanic.Request) -> str|None:
+    '''Content encoding of the response, brotli (when installed) over gzip.'''
+    accepted = {}
+    for item in request.headers.get('Accept-Encoding', '').split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0
+        accepted[name.strip().lower()] = quality
+    for encoding in (('br',) if brotli is not None else ()) + ('gzip',):
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(request: sanic.Request, response: sanic.HTTPResponse):
+    '''Compresses a text response body for clients accepting it.'''
+    if (
+        response is None
+        or response.body is None
+        or len(response.body) < MIN_COMPRESS_BYTES
+        or 'Content-Encoding' in response.headers
+        or not (response.content_type or '').startswith(COMPRESSIBLE_TYPES)
+    ):
+        return
+    response.headers['Vary'] = 'Accept-Encoding'
+    encoding = negotiate(request)
+    if encoding == 'br':
+        response.body = brotli.compress(response.body, quality=BROTLI_QUALITY)
+    elif encoding == 'gzip':
+        response.body = gzip.compress(response.body, compresslevel=GZIP_LEVEL, mtime=0)
+    else:
+        return
+    response.headers['Content-Encoding'] = encoding
@@ -0,0 +1,181 @@
+import sqlite3
+from typing import Callable
+
+import numpy as np
+
+import arrays
+
+
+PERIODS = ('year', 'quarter', 'month')
+COLUMNS = ('year', 'period', 'ticker', 'fee', 'investment', 'value', 'profit', 'twr', 'xirr')
+
+# Newton or bisection steps of the XIRR, on the log of the annual growth factor
+XIRR_ITERATIONS = 100
+XIRR_TOLERANCE = 1e-9
+# bracket of the log, keeps exp() finite and is far beyond any real annual rate
+XIRR_LOG_LIMIT = 50
+
+
+class DailyValues:
+    '''Instrument x date matrices of the daily fee, investment and value, NaN where NULL or missing.'''
+
+    def __init__(self, days: np.ndarray, tickers: list[str], exists: np.ndarray, fee: np.ndarray, investment: np.ndarray, value: np.ndarray):
+        self.days = days
+        self.tickers = tickers
+        self.exists = exists
+        self.fee = fee
+        self.investment = investment
+        self.value = value
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection) -> 'DailyValues':
+        '''The `daily_values` table, an instrument has no cells before its first row.'''
+        rows = arrays.fetch(conn, 'SELECT ticker, date, fee, investment, value FROM daily_values ORDER BY ticker, date')
+        names = [d[0] for d in rows]
+        # rows are ordered by ticker, a new one starts wherever the name changes
+        starts = [i for i in range(len(names)) if not i or names[i] != names[i - 1]]
+        tickers = [names[i] for i in starts]
+        ticker_idx = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(names)).astype(np.int64)))
+        days, day_idx = np.unique(arrays.days([d[1] for d in rows]), return_inverse=True)
+        shape = (len(tickers), len(days))
+        exists = np.zeros(shape, dtype=bool)
+        exists[ticker_idx, day_idx] = True
+        matrices = []
+        for i in (2, 3, 4):
+            m = np.full(shape, np.nan)
+            m[ticker_idx, day_idx] = arrays.column(rows, i)
+            matrices.append(m)
+        return cls(days, tickers, exists, *matrices)
+
+
+def _periods(days: np.ndarray, period: str) -> tuple[np.ndarray, Callable[[int], int|str]]:
+    '''Period number of every day and the labels of the numbers, years stay numbers.'''
+    months = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    if period == 'month':
+        return months, lambda n: f'{1970 + n//12}-{n%12 + 1:02d}'
+    if period == 'quarter':
+        return months//3, lambda n: f'{1970 + n//4}-Q{n%4 + 1}'
+    return months//12, lambda n: 1970 + n
+
+
+def _xirr(cash: np.ndarray, years: np.ndarray, group: np.ndarray, start_value: np.ndarray, span: np.ndarray) -> np.ndarray:
+    '''
+    Annual rates making the present value of the cash flows (`cash` received `years`
+    after the start of their `group`) equal to the `start_value` of each group.
+    Newton's method runs for all the groups at once, kept within a bracket of the root
+    that is bisected when a step leaves it. NaN where there is no root in the bracket.
+    '''
+    size = len(start_value)
+
+    def npv(x):
+        discounted = cash*np.exp(-years*x[group])
+        return np.bincount(group, discounted, size) - start_value, np.bincount(group, -years*discounted, size)
+
+    received = np.bincount(group, np.maximum(cash, 0), size)
+    paid = start_value + np.bincount(group, np.maximum(-cash, 0), size)
+    lo = np.full(size, -XIRR_LOG_LIMIT, dtype=np.float64)
+    hi = np.full(size, XIRR_LOG_LIMIT, dtype=np.float64)
+    lo_sign = np.sign(npv(lo)[0])
+    found = (received > 0) & (paid > 0) & (lo_sign*np.sign(npv(hi)[0]) < 0)
+    # exact for money put in once at the start and taken out once at the end
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = np.where(found & (span > 0), np.log(received/paid)/span, 0)
+    x = np.clip(x, lo/2, hi/2)
+    for _ in range(XIRR_ITERATIONS):
+        value, slope = npv(x)
+        below = np.sign(value) == lo_sign
+        lo = np.where(below, x, lo)
+        hi = np.where(below, hi, x)
+        step = np.divide(value, slope, out=np.zeros(size), where=slope != 0)
+        newton = x - step
+        inside = (slope != 0) & (newton > lo) & (newton < hi)
+        next_x = np.where(inside, newton, (lo + hi)/2)
+        done = (np.abs(next_x - x) < XIRR_TOLERANCE) | (value == 0)
+        x = np.where(done, x, next_x)
+        if np.all(done | ~found):
+            break
+    return np.where(found, np.expm1(x), np.nan)
+
+
+def performance(data: DailyValues, period: str = 'year') -> dict[str, list]:
+    '''
+    Column lists of the performance of every instrument in every period with an investment
+    at its end, ordered by period and ticker. `fee` and `profit` are those of the period,
+    `investment` is the value at the start of the period plus the money invested during it.
+
+    `twr` is the time-weighted return of the period, chained from daily returns where money
+    put in (trades and fees) counts from the start of the day and money taken out from its end.
+    `xirr` is the annual money-weighted return of the same cash flows, starting with
+    the value at the end of the previous period and ending with the value at the end of this one.
+    All instruments and periods are computed together from the daily matrices.
+    '''
+    n_tickers, n_days = data.fee.shape
+    if not n_days or not n_tickers:
+        return {name: [] for name in COLUMNS}
+    numbers, label = _periods(data.days, period)
+    starts = np.flatnonzero(np.append(True, numbers[1:] != numbers[:-1]))
+    last = np.append(starts[1:], n_days) - 1
+    day_period = np.cumsum(np.append(False, numbers[1:] != numbers[:-1]))
+    n_periods = len(starts)
+
+    # the rows of the periods, each one follows the last earlier period with a row of the instrument,
+    # periods without any dates may lie between them
+    fee, investment, value = (m[:, last] for m in (data.fee, data.investment, data.value))
+    profit = value - investment - fee
+    having = data.exists[:, last] & ~np.isnan(investment) & (investment != 0)
+    has_row = data.exists[:, last] & ~np.isnan(investment)
+    latest = np.maximum.accumulate(np.where(has_row, np.arange(n_periods), -1), axis=1)
+    before = np.full_like(latest, -1)
+    before[:, 1:] = latest[:, :-1]
+
+    def previous(m):
+        return np.where(before >= 0, np.take_along_axis(m, np.maximum(before, 0), axis=1), 0)
+
+    period_fee = fee - previous(fee)
+    period_investment = previous(value) + investment - previous(investment)
+    period_profit = profit - previous(profit)
+
+    # daily cash flows, the cumulative investment and fee are NULL before the first trade
+    known = data.exists & ~np.isnan(data.value)
+    daily_value = np.where(known, data.value, 0)
+    invested = np.diff(np.where(data.exists, np.nan_to_num(data.investment), 0), axis=1, prepend=0)
+    fees = np.diff(np.where(data.exists, np.nan_to_num(data.fee), 0), axis=1, prepend=0)
+    paid_in = np.maximum(invested, 0) + fees
+    taken_out = np.maximum(-invested, 0)
+
+    prev_value = np.zeros_like(daily_value)
+    prev_value[:, 1:] = daily_value[:, :-1]
+    prev_known = np.zeros_like(known)
+    prev_known[:, 1:] = known[:, :-1]
+    base = prev_value + paid_in
+    valid = known & (prev_known | (prev_value == 0)) & (base > 0)
+    growth = np.where(valid, (daily_value + taken_out)/np.where(valid, base, 1), 1)
+    twr = np.multiply.reduceat(growth, starts, axis=1) - 1
+    twr = np.where(np.logical_or.reduceat(valid, starts, axis=1), twr, np.nan)
+
+    # cash flows of the investor, the value is taken out at the end of the period
+    cash = taken_out - paid_in
+    cash[:, last] += daily_value[:, last]
+    origin = np.where(starts > 0, starts - 1, 0)
+    rows, cols = np.nonzero(cash)
+    group = rows*n_periods + day_period[cols]
+    years = (data.days[cols] - data.days[origin][day_period[cols]])/365
+    start_value = np.where(starts > 0, daily_value[:, origin], 0).ravel()
+    span = np.tile((data.days[last] - data.days[origin])/365, n_tickers)
+    xirr = _xirr(cash[rows, cols], years, group, start_value, span).reshape(n_tickers, n_periods)
+
+    # ordered by period, then ticker
+    period_idx, ticker_idx = np.nonzero(having.T)
+    pick = (ticker_idx, period_idx)
+    period_numbers = numbers[last][period_idx].tolist()
+    return {
+        'year': [int(d) for d in data.days[last][period_idx].astype('datetime64[D]').astype('datetime64[Y]').astype(np.int64) + 1970],
+        'period': [label(n) for n in period_numbers],
+        'ticker': [data.tickers[t] for t in ticker_idx.tolist()],
+        'fee': arrays.nullable(period_fee[pick]),
+        'investment': arrays.nullable(period_investment[pick]),
+        'value': arrays.nullable(value[pick]),
+        'profit': arrays.nullable(period_profit[pick]),
+        'twr': arrays.nullable(twr[pick]),
+        'xirr': arrays.nullable(xirr[pick]),
+    }
@@ -1,42 +1,137 @@
+import asyncio
 import threading
 from typing import NamedTuple
 from collections import defaultdict
 import os
 import time
 import datetime
+import itertools
 import json
-import sqlite3
 import webbrowser
 
-import requests
 import sanic
+import sanic.exceptions
 import sanic.response
-import yfinance
 import sys
 
-FILE_PATH = os.path.dirname(__file__)
+import daily_values
+import downsample
+import events
+import fx_rates
+import imports
+import market_data
+import migrations
+import paging
+import responses
+import returns
+import timeseries
+import valuation
+from cache import ResponseCache
+from database import Database
+from jobs import Job, JobManager, JobStore
+from metrics import Metrics
 
-yfinance_fx = {
-    ('USD', 'CZK'): 'CZK=X'
-}
-def get_yfinance_fx_ticker(from_curr: str, to_curr: str):
-    try:
-        return yfinance_fx[(from_curr, to_curr)]
-    except KeyError:
-        return f'{from_curr}{to_curr}=X'
+FILE_PATH = os.path.dirname(__file__)
 
 class Config(NamedTuple):
     db: str
     base_currency: str
     language_locale: str
-
-with open(os.path.join(FILE_PATH, '../config.json')) as f:
+    update_overlap_days: int = 7
+    update_concurrency: int = 4
+    db_workers: int = 4
+    valuation_engine: str = 'sql'
+    cache_max_bytes: int = 64*1024*1024
+    update_interval_minutes: int = 0
+    slow_query_ms: float = 250
+    explain_queries: bool = False
+    fx_pivot: str = 'USD'
+    workers: int = 1
+    host: str = 'localhost'
+    port: int = 8000
+    fx_provider: str = 'yfinance'
+    market_data_fixtures: str|None = None
+    http_timeout: float = 30
+    http_retries: int = 3
+    keep_ohlc: bool = True
+
+# PORTFOLIO_CONFIG points the server at another config, e.g. a benchmark database
+with open(os.environ.get('PORTFOLIO_CONFIG', os.path.join(FILE_PATH, '../config.json'))) as f:
     config = Config(**json.load(f))
 
-app = sanic.Sanic("PortfolioApp")
+app = sanic.Sanic("PortfolioApp", dumps=responses.dumps)
 app.static('/assets', os.path.join(FILE_PATH, '../build/assets'))
-db = sqlite3.connect(os.path.join(FILE_PATH, config.db))
-db.row_factory = sqlite3.Row
+metrics = Metrics(config.slow_query_ms, config.explain_queries)
+db = Database(os.path.join(FILE_PATH, config.db), config.db_workers, metrics)
+
+
+# replaced as a whole by a reload, requests keep using the engine they got
+engine: valuation.ValuationEngine|None = None
+engine_lock = asyncio.Lock()
+# read endpoints are cached until the next committed write
+cached = ResponseCache(lambda: db.version, config.cache_max_bytes)
+# market data sources by instrument evaluation, local files only when fixtures are configured
+providers = market_data.Registry(fixtures=os.path.join(FILE_PATH, config.market_data_fixtures) if config.market_data_fixtures else None)
+providers.register('http', lambda: market_data.HttpProvider(config.http_timeout, config.http_retries, config.update_concurrency))
+# with several server processes jobs are claimed and followed through a database next to the main one
+job_manager = JobManager(store=JobStore(os.path.splitext(db.path)[0] + '.jobs.db') if config.workers > 1 else None)
+# data changes and job progress pushed to the open `/events` streams
+event_feed = events.EventFeed(db, job_manager)
+
+
+@app.before_server_start
+async def prepare_db(app:sanic.Sanic):
+    db.open()
+    await db.write(migrations.migrate)
+    await db.read(migrations.check_query_plans)
+    if not config.keep_ohlc:
+        await db.write(timeseries.prune_ohlc)
+    await db.write(daily_values.ensure, config.base_currency)
+    if config.valuation_engine == 'numpy':
+        await valuation_engine()
+
+
+@app.after_server_stop
+async def close_db(app:sanic.Sanic):
+    db.close()
+
+
+@app.after_server_start
+async def schedule_updates(app:sanic.Sanic):
+    if config.update_interval_minutes:
+        app.add_task(job_manager.schedule('market_data', update_market_data, config.update_interval_minutes*60))
+    app.add_task(event_feed.run())
+
+
+@app.on_request
+async def start_timer(request:sanic.Request):
+    request.ctx.started = time.perf_counter()
+
+
+@app.on_response
+async def record_latency(request:sanic.Request, response):
+    started = getattr(request.ctx, 'started', None)
+    if started is not None:
+        route = f'/{request.route.path}' if request.route else 'unmatched'
+        metrics.observe_request(route, time.perf_counter() - started)
+
+
+@app.on_response
+async def compress_response(request:sanic.Request, response):
+    responses.compress(request, response)
+
+
+async def valuation_engine() -> valuation.ValuationEngine:
+    '''Valuation engine loaded with the current data, concurrent requests wait for a single reload.'''
+    global engine
+    async with engine_lock:
+        version = db.version
+        if engine is None or engine.version != version:
+            loaded = valuation.ValuationEngine(config.base_currency)
+            await db.read(loaded.load)
+            loaded.version = version
+            engine = loaded
+    return engine
 
 
 @app.get("/config/get")
@@ -44,133 +139,262 @@ async def config_get(request:sanic.Request):
     return sanic.response.json(config._asdict())
 
 
+@app.get("/debug/metrics")
+async def debug_metrics(request:sanic.Request):
+    '''Request and SQL statement histograms, `format=prometheus` for the text exposition format.'''
+    if request.args.get('format') == 'prometheus':
+        return sanic.response.text(metrics.to_prometheus(), content_type='text/plain; version=0.0.4')
+    return sanic.response.json(metrics.to_dict())
+
+
 @app.get("/data/last")
 async def last(request:sanic.Request):
     last_data = {}
-    cursor = db.cursor()
-    cursor.execute('SELECT max(date) as last_historical FROM historical')
-    last_data['historical'] = cursor.fetchone()['last_historical']
-    cursor.execute('SELECT max(date) as fx_historical FROM fx')
-    last_data['fx'] = cursor.fetchone()['fx_historical']
-    cursor.execute('SELECT max(date) as last_manual_value FROM manual_values')
-    last_data['manual_value'] = cursor.fetchone()['last_manual_value']
+    last_data['historical'] = (await db.fetchone('SELECT date(max(day) + 2440587.5) as last_historical FROM prices'))['last_historical']
+    last_data['fx'] = (await db.fetchone('SELECT date(max(day) + 2440587.5) as fx_historical FROM fx_prices'))['fx_historical']
+    last_data['manual_value'] = (await db.fetchone('SELECT max(date) as last_manual_value FROM manual_values'))['last_manual_value']
     return sanic.response.json(last_data)
 
 
-@app.get("/historical/update")
-async def historical_update(request:sanic.Request):
-    cursor = db.cursor()
-    cursor.execute('''
-        SELECT tt.ticker, min(date) as first_date, it.evaluation, it.eval_param
+def parse_date(date: str) -> datetime.datetime:
+    return datetime.datetime(*tuple(int(t) for t in date.split('-')))
+
+
+def update_start(first_date: str, last_date: str|None) -> datetime.datetime:
+    '''
+    Start of the download window. Only the data since the last stored date
+    is refreshed, overlapping a few days back to pick up corrections.
+    '''
+    start = parse_date(first_date)
+    if last_date:
+        start = max(start, parse_date(last_date) - datetime.timedelta(days=config.update_overlap_days))
+    return start
+
+
+def fetch_historical(provider: market_data.Provider, ticker: str, param: str|None, validators: dict, start: datetime.datetime):
+    return (
+        (bar.date, ticker, bar.open, bar.high, bar.low, bar.close, bar.dividends, bar.splits)
+        for bar in provider.historical(ticker, param, start.date(), validators=validators)
+    )
+
+
+def fetch_fx(provider: market_data.Provider, pair: tuple[str, str], start: datetime.datetime):
+    from_curr, to_curr = pair
+    return (
+        (bar.date, from_curr, to_curr, bar.open, bar.high, bar.low, bar.close)
+        for bar in provider.fx(from_curr, to_curr, start.date())
+    )
+
+
+# downloaded rows upserted in one write
+UPSERT_BATCH = 5000
+
+
+async def run_updates(downloads: dict, store, progress: dict):
+    '''
+    Runs blocking downloads concurrently (at most `update_concurrency`
+    at once) and upserts their rows in batches with `store(conn, rows)` while they arrive.
+    Timing and row count of every download key are kept in `progress`,
+    a source that hasn't changed since the last download is `unchanged`.
+    '''
+    semaphore = asyncio.Semaphore(config.update_concurrency)
+    for key in downloads:
+        progress[key] = {'status': 'pending'}
+
+    async def run(key, start, fetch, *args):
+        t0 = time.perf_counter()
+        report = {'status': 'running', 'start': start.strftime('%Y-%m-%d'), 'rows': 0}
+        try:
+            async with semaphore:
+                progress[key] = report
+                rows = iter(await asyncio.to_thread(fetch, *args, start))
+                while batch := await asyncio.to_thread(list, itertools.islice(rows, UPSERT_BATCH)):
+                    await db.write(store, batch)
+                    report['rows'] += len(batch)
+            report['status'] = 'done'
+        except market_data.NotModified:
+            report['status'] = 'unchanged'
+        except Exception as e:
+            print("Failed to download data", key, e)
+            report['status'] = 'failed'
+            report['error'] = str(e)
+        report['seconds'] = round(time.perf_counter() - t0, 3)
+        progress[key] = report
+        return key, report
+
+    return dict(await asyncio.gather(*(run(key, *download) for key, download in downloads.items())))
+
+
+async def update_historical(job:Job):
+    rows = await db.fetchall('''
+        SELECT
+            tt.ticker,
+            min(date) as first_date,
+            (
+                SELECT date(max(pt.day) + 2440587.5) FROM prices AS pt
+                JOIN instrument_ids AS ii ON ii.id = pt.instrument WHERE ii.ticker = tt.ticker
+            ) as last_date,
+            it.evaluation,
+            it.eval_param,
+            fvt.validators
         FROM trades AS tt
         JOIN instruments AS it ON it.ticker = tt.ticker
+        LEFT JOIN feed_validators AS fvt ON fvt.ticker = tt.ticker
         GROUP BY tt.ticker
     ''')
-    first_trades = {
-        d['ticker']: {
-            'first_date': datetime.datetime(*tuple(int(t) for t in d['first_date'].split('-'))),
-            'evaluation': d['evaluation'],
-            'eval_param': json.loads(d['eval_param']) if d['evaluation'] == 'http' else d['eval_param'],
-        } for d in cursor}
-
-    sql = '''
-        INSERT OR IGNORE INTO historical(date, ticker, open, high, low, close, dividends, splits) values (?, ?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT (date, ticker)
-        DO UPDATE SET open = excluded.open, high = excluded.high, low = excluded.low, close = excluded.close, dividends = excluded.dividends, splits = excluded.splits
+    downloads = {}
+    validators = {}
+    for d in rows:
+        provider = providers.get(d['evaluation'])
+        if provider is not None:
+            # without stored prices the previous download doesn't count
+            validators[d['ticker']] = json.loads(d['validators']) if d['validators'] and d['last_date'] else {}
+            downloads[d['ticker']] = (update_start(d['first_date'], d['last_date']), fetch_historical, provider, d['ticker'], d['eval_param'], validators[d['ticker']])
+
+    def store(conn, rows):
+        timeseries.upsert_prices(conn, rows, config.keep_ohlc)
+
+    reports = await run_updates(downloads, store, job.progress)
+    await db.write(apply_historical, reports, validators)
+    return reports
+
+
+def apply_historical(conn, reports: dict, validators: dict):
+    '''Recomputes daily values from the downloaded prices and keeps validators of complete downloads.'''
+    events.record(conn, ['historical'], [ticker for ticker, report in reports.items() if report['rows']])
+    conn.executemany('INSERT OR REPLACE INTO feed_validators(ticker, validators) VALUES (?, ?)', [
+        (ticker, json.dumps(validators[ticker])) for ticker, report in reports.items() if report['status'] == 'done' and validators[ticker]
+    ])
+    daily_values.update(conn, config.base_currency, {
+        ticker: report['start'] for ticker, report in reports.items() if report['rows']
+    })
+
+
+def fx_downloads(conn, first_trade: str) -> dict:
+    '''Pivot pairs with the start of their download window.'''
+    downloads = {}
+    provider = providers.get(config.fx_provider)
+    if provider is None:
+        raise ValueError(f'Unknown fx provider {config.fx_provider}')
+    for from_curr, to_curr in fx_rates.pairs(conn, config.base_currency, config.fx_pivot):
+        last_date = conn.execute('''
+            SELECT date(max(day) + 2440587.5) FROM fx_prices
+            WHERE from_id = (SELECT id FROM currency_ids WHERE name = ?) AND to_id = (SELECT id FROM currency_ids WHERE name = ?)
+        ''', [from_curr, to_curr]).fetchone()[0]
+        downloads[f'{from_curr}/{to_curr}'] = (update_start(first_trade, last_date), fetch_fx, provider, (from_curr, to_curr))
+    return downloads
+
+
+def apply_fx(conn, reports: dict):
     '''
-    for ticker, ticker_info in first_trades.items():
-        try:
-            if ticker_info['evaluation'] == 'yfinance':
-                yticker = yfinance.Ticker(ticker_info['eval_param'] if ticker_info['eval_param'] else ticker)
-                df = yticker.history(start=ticker_info['first_date'])
-                cursor.executemany(sql, [
-                    (date.strftime('%Y-%m-%d'), ticker, row['Open'], row['High'], row['Low'], row['Close'], row['Dividends'], row['Stock Splits'])
-                    for date, row in df.iterrows()
-                ])
-
-            elif ticker_info['evaluation'] == 'http':
-                resp = requests.get(ticker_info['eval_param']['url'])
-                date_key = ticker_info['eval_param']['date']
-                open_key = ticker_info['eval_param'].get('open')
-                close_key = ticker_info['eval_param'].get('close')
-                high_key = ticker_info['eval_param'].get('high')
-                low_key = ticker_info['eval_param'].get('low')
-                dvd_key = ticker_info['eval_param'].get('dividends')
-                split_key = ticker_info['eval_param'].get('stock_splits')
-                cursor.executemany(sql, [
-                    (
-                        d[date_key],
-                        ticker,
-                        d.get(open_key, 0),
-                        d.get(high_key, 0),
-                        d.get(low_key, 0),
-                        d.get(close_key, 0),
-                        d.get(dvd_key, 0),
-                        d.get(split_key, 0),
-                    )
-                    for d in resp.json()
-                ])
-
-            db.commit()
-        except Exception as e:
-            print("Failed to download data", ticker, ticker_info, e)
+    Derives daily base currency rates from the downloaded pairs. Once every pivot pair is stored,
+    pairs that are no longer needed (e.g. stored before the pivot was used) are dropped.
+    '''
+    keep = [tuple(key.split('/')) for key in reports]
+    if any(report['rows'] for report in reports.values()):
+        events.record(conn, ['fx'])
+    changes = {tuple(key.split('/')): report['start'] for key, report in reports.items() if report['rows']}
+    if fx_rates.prune(conn, keep):
+        currencies = fx_rates.update(conn, config.base_currency, {c: fx_rates.FIRST_DATE for c in fx_rates.currencies(conn)})
+    else:
+        currencies = fx_rates.update_pairs(conn, config.base_currency, changes)
+    daily_values.update_currencies(conn, config.base_currency, currencies)
+
+
+async def update_fx(job:Job):
+    first_trade = (await db.fetchone('SELECT min(date) as first_trade FROM trades'))['first_trade']
+    downloads = await db.read(fx_downloads, first_trade)
+
+    def store(conn, rows):
+        timeseries.upsert_fx(conn, rows, config.keep_ohlc)
+
+    reports = await run_updates(downloads, store, job.progress)
+    await db.write(apply_fx, reports)
+    return reports
+
+
+async def update_market_data(job:Job):
+    '''Prices followed by fx rates, joining update jobs that are already running.'''
+    result = {}
+    for kind, update in (('historical', update_historical), ('fx', update_fx)):
+        part = await job_manager.start(kind, update)
+        job.progress[kind] = part.progress
+        await part.wait()
+        if part.status == 'failed':
+            raise RuntimeError(f'{kind} update failed: {part.error}')
+        result[kind] = part.result
+    return result
 
-    return sanic.response.json({'success': True})
+
+@app.get("/historical/update")
+async def historical_update(request:sanic.Request):
+    job = await job_manager.start('historical', update_historical)
+    await job.wait()
+    return sanic.response.json({'success': job.status == 'done', 'tickers': job.result})
 
 
 @app.get("/fx/update")
 async def fx_update(request:sanic.Request):
-    cursor = db.cursor()
-    cursor.execute('SELECT min(date) as first_trade FROM trades')
-    first_trade = tuple(int(t) for t in (cursor.fetchone())['first_trade'].split('-'))
-
-    cursor = db.cursor()
-    cursor.execute('SELECT DISTINCT currency FROM instruments')
-    currencies = [d['currency'] for d in cursor]
-
-    sql = '''
-        INSERT OR IGNORE INTO fx(date, from_curr, to_curr, open, high, low, close) VALUES (?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT (date, from_curr, to_curr)
-        DO UPDATE SET open = excluded.open, high = excluded.high, low = excluded.low, close = excluded.close
-    '''
-    for currency in currencies:
-        if currency != config.base_currency:
-            ticker = get_yfinance_fx_ticker(currency, config.base_currency)
-            yticker = yfinance.Ticker(ticker)
-            df = yticker.history(start=datetime.datetime(*first_trade))
-            cursor.executemany(sql, [
-                (date.strftime('%Y-%m-%d'), currency, config.base_currency, row['Open'], row['High'], row['Low'], row['Close'])
-                for date, row in df.iterrows()
-            ])
-            db.commit()
+    job = await job_manager.start('fx', update_fx)
+    await job.wait()
+    return sanic.response.json({'success': job.status == 'done', 'currencies': job.result})
 
-    return sanic.response.json({'success': True})
+
+@app.get("/market_data/update")
+async def market_data_update(request:sanic.Request):
+    '''Starts prices and fx rates update in the background and returns the job right away.'''
+    job = await job_manager.start('market_data', update_market_data)
+    return sanic.response.json(job.to_dict())
+
+
+@app.get("/jobs/get")
+async def jobs_get(request:sanic.Request):
+    job = await job_manager.get(request.args.get('id'))
+    if job is None:
+        raise sanic.exceptions.NotFound('Unknown job')
+    return sanic.response.json(job.to_dict())
+
+
+@app.get("/jobs/list")
+async def jobs_list(request:sanic.Request):
+    return sanic.response.json(await job_manager.list())
+
+
+@app.get("/events")
+async def events_stream(request:sanic.Request):
+    '''
+    Server-sent events: `data` with the tables and tickers changed by every commit,
+    `job` with the progress of update jobs. A reconnecting client gets what it missed
+    since its `Last-Event-ID` in the first (`hello`) event.
+    '''
+    last_event_id = request.headers.get('Last-Event-ID')
+    await event_feed.stream(request, int(last_event_id) if last_event_id and last_event_id.isdigit() else None)
 
 
 @app.get("/overview/get")
+@cached
 async def overview(request:sanic.Request):
-    cursor = db.cursor()
-    cursor.execute('''
+    rows = await db.fetchall('''
         SELECT
             tt.ticker,
             it.currency,
             it.type,
-            sum(volume) as volume,
+            (select volume from positions where ticker = it.ticker order by start_date desc limit 1) as volume,
             sum(CASE WHEN fee THEN fee ELSE 0 END) as fee,
             sum(price*(CASE WHEN volume THEN volume ELSE 1 END)/(CASE WHEN rate THEN rate ELSE 1 END)) as invested,
-            (select close from historical where ticker = it.ticker order by date desc) as last_price,
+            (select close from prices where instrument = (select id from instrument_ids where ticker = it.ticker) order by day desc limit 1) as last_price,
             (case when it.evaluation = 'manual' then
                 (case when it.currency = ? then 1 else
-                    (select close from fx where from_curr = it.currency and to_curr = ? order by date desc)
+                    (select rate from fx_daily where from_curr = it.currency and to_curr = ? order by date desc limit 1)
                 end)*(
                     (select value from manual_values where ticker = it.ticker order by date desc)
                 )
             else
-                (select close from historical where ticker = it.ticker order by date desc)*
+                (select close from prices where instrument = (select id from instrument_ids where ticker = it.ticker) order by day desc limit 1)*
                 (case when it.currency = ? then 1 else
-                    (select close from fx where from_curr = it.currency and to_curr = ? order by date desc)
+                    (select rate from fx_daily where from_curr = it.currency and to_curr = ? order by date desc limit 1)
                 end)*
-                sum(volume)
+                (select volume from positions where ticker = it.ticker order by start_date desc limit 1)
             end) as value,
             (case when it.evaluation='manual' then
                 (select
@@ -189,129 +413,70 @@ async def overview(request:sanic.Request):
         ORDER BY tt.ticker
         ''', [config.base_currency, config.base_currency, config.base_currency, config.base_currency]
     )
-    return sanic.response.json([
+    return responses.rows(request, [
         {
             **dict(d),
             'value': d['value'] + (d['manual_value_correction'] if d['manual_value_correction'] else 0),
             'profit': d['value'] - d['invested'] - d['fee'] + (d['manual_value_correction'] if d['manual_value_correction'] else 0),
         }
-        for d in cursor
+        for d in rows
     ])
 
 
 @app.get("/performance/get")
+@cached
 async def performance(request:sanic.Request):
-    cursor = db.cursor()
-    cursor.execute('''
-        select
-            substr(date, 1, 4) as year,
-            max(date) as date,
-            ticker,
-            fee,
-            investment,
-            (case when evaluation='manual'
-                THEN fx_price*(manual_value+(case when manual_value_correction then manual_value_correction else 0 end))
-                ELSE fx_price*last_price*volume
-            END) as value,
-            (case when evaluation='manual'
-                THEN fx_price*(manual_value+(case when manual_value_correction then manual_value_correction else 0 end))
-                ELSE fx_price*last_price*volume
-            END)-investment-fee as profit
-        from (
-            select
-                dt.date,
-                it.ticker,
-                it.evaluation,
-                sum(
-                    (case when tt.volume then tt.volume else 1 end)*tt.price/
-                    (case when tt.rate then tt.rate else 1 end)
-                ) over (PARTITION BY it.ticker ORDER BY dt.date RANGE BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) as investment,
-                sum(tt.volume) over (PARTITION BY it.ticker ORDER BY dt.date RANGE BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) as volume,
-                (select close from historical where date <= dt.date and ticker = it.ticker order by date desc) as last_price,
-                (case when it.currency = ? then 1 else
-                    (select close from fx where from_curr = it.currency and to_curr = ? order by date desc)
-                end) as fx_price,
-                sum(tt.fee) over (PARTITION BY it.ticker ORDER BY dt.date RANGE BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) as fee,
-                (case when it.evaluation='manual' then
-                    (select value from manual_values where date <= dt.date and ticker = it.ticker order by date desc)
-                else null end) as manual_value,
-                (case when it.evaluation='manual' then
-                    (select
-                        sum(
-                            (case when volume then volume else 1 end)*price/
-                            (case when rate then rate else 1 end)
-                        ) from trades
-                        where date <= dt.date and ticker = it.ticker and date >
-                            (select date from manual_values where date <= dt.date and ticker = it.ticker order by date desc)
-                    )
-                else null end) as manual_value_correction
-            from (
-                select distinct date from fx UNION
-                select distinct date from trades UNION
-                select distinct date from historical UNION
-                select distinct date from manual_values
-            ) as dt
-            left join instruments as it
-            left join fx as ft on ft.from_curr = it.currency and ft.date = dt.date
-            left join trades as tt on tt.ticker = it.ticker and tt.date = dt.date
-            left join historical as ht on ht.ticker = it.ticker and ht.date = dt.date
-        )
-        group by year, ticker
-        having investment
-        order by year, ticker
-        ''', [config.base_currency, config.base_currency]
-    )
-    data = defaultdict(dict)
-    for d in cursor:
-        year = int(d['year'])
-        ticker = d['ticker']
-
-        prev_value = 0
-        prev_fee = 0
-        prev_investment = 0
-        prev_profit = 0
-
-        if year-1 in data and ticker in data[year-1]:
-            prev_value = data[year-1][ticker]['value']
-            prev_fee = data[year-1][ticker]['fee']
-            prev_investment = data[year-1][ticker]['investment']
-            prev_profit = data[year-1][ticker]['profit']
-
-        data[year][ticker] = {
-            'fee': d['fee'] - prev_fee,
-            'investment': prev_value + d['investment'] - prev_investment,
-            'value': d['value'],
-            'profit': d['profit'] - prev_profit,
-        }
-    return sanic.response.json(dict(data))
+    '''
+    Performance of every instrument per `period` (`year`, `quarter` or `month`),
+    with its time-weighted and money-weighted (XIRR) returns.
+    '''
+    period = request.args.get('period', 'year')
+    if period not in returns.PERIODS:
+        raise sanic.exceptions.BadRequest(f'Unknown period {period}')
+    # computed on a pool thread, the XIRR iterations would block the event loop
+    if config.valuation_engine == 'numpy':
+        e = await valuation_engine()
+        data = returns.DailyValues(e.days, e.tickers, e.exists, e.fee, e.investment, e.value)
+        columns = await asyncio.to_thread(returns.performance, data, period)
+    else:
+        columns = await db.read(lambda conn: returns.performance(returns.DailyValues.load(conn), period))
+    if responses.columnar(request):
+        # one row per period and ticker
+        return responses.table(request, columns)
+    result = defaultdict(dict)
+    for key, ticker, *values in zip(columns['period'], columns['ticker'], *(columns[name] for name in returns.COLUMNS[3:])):
+        result[key][ticker] = dict(zip(returns.COLUMNS[3:], values))
+    return sanic.response.json(dict(result))
 
 
 @app.get("/dividends/calc")
+@cached
 async def dividends_calc(request:sanic.Request):
-    cursor = db.cursor()
-    cursor.execute('''
+    rows = await db.fetchall('''
         SELECT
             dt.ticker,
             sum(dt.dividends) as dividends,
             it.currency
         FROM (
             SELECT
-                ht.date,
-                ht.ticker,
-                ht.dividends * (select sum(volume) from trades where date <= ht.date and ticker = ht.ticker) as dividends
-            FROM historical as ht
-            WHERE dividends > 0
+                ii.ticker,
+                pt.dividends * (
+                    -- the interval in force, intervals are contiguous
+                    select volume from positions where ticker = ii.ticker and start_date <= date(pt.day + 2440587.5) order by start_date desc limit 1
+                ) as dividends
+            FROM prices as pt
+            JOIN instrument_ids as ii ON ii.id = pt.instrument
+            WHERE pt.dividends > 0
         ) dt
         JOIN instruments AS it ON it.ticker = dt.ticker
         GROUP BY dt.ticker
     ''')
-    return sanic.response.json({d['ticker']: dict(d) for d in cursor})
+    return sanic.response.json({d['ticker']: dict(d) for d in rows})
 
 
 @app.get("/dividends/list")
 async def dividends_list(request:sanic.Request):
-    cursor = db.cursor()
-    cursor.execute('''
+    rows = await db.fetchall('''
         SELECT
             date,
             ticker,
@@ -319,26 +484,29 @@ async def dividends_list(request:sanic.Request):
         FROM dividends
         ORDER BY date DESC
     ''')
-    return sanic.response.json([dict(d) for d in cursor])
+    return sanic.response.json([dict(d) for d in rows])
 
 
 @app.post("/dividends/new")
 async def dividends_new(request:sanic.Request):
     data = request.json
-    cursor = db.cursor()
-    cursor.execute('''
-        INSERT INTO dividends(date, ticker, dividend)
-        VALUES (?, ?, ?)''',
-        [data['date'], data['ticker'], data['dividend']]
-    )
-    db.commit()
+
+    def insert(conn):
+        conn.execute('''
+            INSERT INTO dividends(date, ticker, dividend)
+            VALUES (?, ?, ?)''',
+            [data['date'], data['ticker'], data['dividend']]
+        )
+        events.record(conn, ['dividends'], [data['ticker']])
+
+    await db.write(insert)
     return sanic.response.json({'success': True})
 
 
 @app.get("/dividends/sum")
+@cached
 async def dividends_sum(request:sanic.Request):
-    cursor = db.cursor()
-    cursor.execute('''
+    rows = await db.fetchall('''
         SELECT
             dt.ticker,
             sum(dt.dividend) as dividends,
@@ -347,213 +515,386 @@ async def dividends_sum(request:sanic.Request):
         JOIN instruments AS it ON it.ticker = dt.ticker
         GROUP BY dt.ticker
     ''')
-    return sanic.response.json({d['ticker']: dict(d) for d in cursor})
+    return sanic.response.json({d['ticker']: dict(d) for d in rows})
+
+
+def chart_range(request:sanic.Request) -> tuple[str|None, str|None, str, int|None]:
+    '''`from`, `to`, `resolution` and the number of points to downsample to of a chart request.'''
+    resolution = request.args.get('resolution', 'daily')
+    points = None
+    if resolution.isdigit():
+        resolution, points = 'daily', int(resolution)
+        if points < 2:
+            raise sanic.exceptions.BadRequest('Resolution must be at least 2 points')
+    elif resolution not in downsample.RESOLUTIONS:
+        raise sanic.exceptions.BadRequest(f'Unknown resolution {resolution}')
+    start, end = (request.args.get(name) for name in ('from', 'to'))
+    try:
+        # both engines get the same normalized dates
+        start, end = (datetime.date.fromisoformat(d).isoformat() if d else None for d in (start, end))
+    except ValueError:
+        raise sanic.exceptions.BadRequest('Invalid date range')
+    return start, end, resolution, points
+
+
+def chart_dates(start: str|None, end: str|None, resolution: str) -> tuple[list[str], list]:
+    '''Conditions on `daily_values` dates of a chart and their parameters.'''
+    where = []
+    params = []
+    if start:
+        where.append('date >= ?')
+        params.append(start)
+    if end:
+        where.append('date <= ?')
+        params.append(end)
+    if resolution in downsample.PERIOD_SQL:
+        where.append(f'''date IN (
+            SELECT max(date) FROM daily_values
+            WHERE date >= ? AND date <= ?
+            GROUP BY {downsample.PERIOD_SQL[resolution]}
+        )''')
+        params += [start or daily_values.FIRST_DATE, end or '9999-99-99']
+    return where, params
+
+
+def downsampled(data: dict[str, list], points: int|None) -> dict[str, list]:
+    if points is None:
+        return data
+    picked = downsample.lttb(data['value'], points)
+    return {name: [values[i] for i in picked] for name, values in data.items()}
 
 
 @app.get("/charts/get")
+@cached
 async def charts(request:sanic.Request):
+    '''
+    Daily portfolio value. The `from` and `to` dates limit the range,
+    `resolution` is `daily`, `weekly`, `monthly` (last day of each period)
+    or a number of points the series is downsampled to.
+    '''
     filter = request.args.get('filter')
-    cursor = db.cursor()
-    cursor.execute(f'''
-        select
-            date,
-            sum(fee) as fee,
-            sum(investment) as investment,
-            sum(case when evaluation='manual'
-                THEN fx_price*(manual_value+(case when manual_value_correction then manual_value_correction else 0 end))
-                ELSE fx_price*last_price*volume
-            END) as value,
-            sum(case when evaluation='manual'
-                THEN fx_price*(manual_value+(case when manual_value_correction then manual_value_correction else 0 end))
-                ELSE fx_price*last_price*volume
-            END)-sum(investment)-sum(fee) as profit
-        from (
-            select
-                max(tt.id),
-                dt.date,
-                it.ticker,
-                it.evaluation,
-                sum(
-                    (case when tt.volume then tt.volume else 1 end)*tt.price/
-                    (case when tt.rate then tt.rate else 1 end)
-                ) over (PARTITION BY it.ticker ORDER BY dt.date, tt.id RANGE BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) as investment,
-                sum(tt.volume) over (PARTITION BY it.ticker ORDER BY dt.date, tt.id RANGE BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) as volume,
-                (select close from historical where date <= dt.date and ticker = it.ticker order by date desc) as last_price,
-                (case when it.currency = ? then 1 else
-                    (select close from fx where from_curr = it.currency and to_curr = ? order by date desc)
-                end) as fx_price,
-                sum(tt.fee) over (PARTITION BY it.ticker ORDER BY dt.date, tt.id RANGE BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) as fee,
-                (case when it.evaluation='manual' then
-                    (select value from manual_values where date <= dt.date and ticker = it.ticker order by date desc)
-                else null end) as manual_value,
-                (case when it.evaluation='manual' then
-                    (select
-                        sum(
-                            (case when volume then volume else 1 end)*price/
-                            (case when rate then rate else 1 end)
-                        ) from trades
-                        where date <= dt.date and ticker = it.ticker and date >
-                            (select date from manual_values where date <= dt.date and ticker = it.ticker order by date desc)
-                    )
-                else null end) as manual_value_correction
-            from (
-                select distinct date from fx UNION
-                select distinct date from trades UNION
-                select distinct date from historical UNION
-                select distinct date from manual_values
-            ) as dt
-            left join instruments as it
-            left join fx as ft on ft.from_curr = it.currency and ft.date = dt.date
-            left join trades as tt on tt.ticker = it.ticker and tt.date = dt.date
-            left join historical as ht on ht.ticker = it.ticker and ht.date = dt.date
-            {'where it.ticker = ? or it.type = ?' if filter else ''}
-            group by dt.date, it.ticker
-        )
-        group by date
-        having sum(investment)
-        order by date
-    ''', [config.base_currency, config.base_currency] + ([filter, filter] if filter else []))
-    return sanic.response.json([dict(row) for row in cursor])
+    start, end, resolution, points = chart_range(request)
+
+    if config.valuation_engine == 'numpy':
+        engine = await valuation_engine()
+        data = engine.charts(filter, engine.columns(start, end, resolution))
+    else:
+        where, params = chart_dates(start, end, resolution)
+        if filter:
+            where.append('(it.ticker = ? OR it.type = ?)')
+            params += [filter, filter]
+        rows = await db.fetchall(f'''
+            SELECT
+                date,
+                sum(fee) as fee,
+                sum(investment) as investment,
+                sum(value) as value,
+                sum(value)-sum(investment)-sum(fee) as profit
+            FROM daily_values AS dv
+            {'JOIN instruments AS it ON it.ticker = dv.ticker' if filter else ''}
+            {f'WHERE {" AND ".join(where)}' if where else ''}
+            GROUP BY date
+            HAVING sum(investment)
+            ORDER BY date
+        ''', params)
+        data = responses.columns(rows, ('date', 'fee', 'investment', 'value', 'profit'))
+
+    return responses.table(request, downsampled(data, points))
+
+
+def chart_series(conn, types: list[str]|None, tickers: list[str], where: list[str], params: list) -> dict:
+    '''
+    Total, per type and per ticker daily sums from a single scan of `daily_values`,
+    `types` None means all of them. Every series is a set of conditional sums
+    of the same date groups.
+    '''
+    if types is None:
+        types = [d[0] for d in conn.execute('SELECT DISTINCT type FROM instruments ORDER BY type')]
+    # (group, name, condition on the rows of the series)
+    series = [('total', None, None)]
+    series += [('types', type, 'it.type = ?') for type in types]
+    series += [('tickers', ticker, 'dv.ticker = ?') for ticker in tickers]
+    sums = ', '.join(
+        f'sum(CASE WHEN {condition} THEN {column} END)' if condition else f'sum({column})'
+        for _, _, condition in series for column in ('fee', 'investment', 'value')
+    )
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    rows = cursor.execute(f'''
+        SELECT date, {sums}
+        FROM daily_values AS dv
+        JOIN instruments AS it ON it.ticker = dv.ticker
+        {f'WHERE {" AND ".join(where)}' if where else ''}
+        GROUP BY date
+        ORDER BY date
+    ''', [name for _, name, condition in series if condition for _ in range(3)] + params).fetchall()
+
+    result = {'total': None, 'types': {}, 'tickers': {}}
+    for i, (group, name, _) in enumerate(series):
+        series_rows = []
+        for row in rows:
+            fee, investment, value = row[1 + 3*i:4 + 3*i]
+            if investment:
+                series_rows.append((row[0], fee, investment, value, None if None in (fee, investment, value) else value - investment - fee))
+        data = responses.columns(series_rows, ('date', 'fee', 'investment', 'value', 'profit'))
+        if group == 'total':
+            result['total'] = data
+        else:
+            result[group][name] = data
+    return result
+
+
+@app.get("/charts/batch")
+@cached
+async def charts_batch(request:sanic.Request):
+    '''
+    Several chart series valued in one pass: the `total`, one per type in `types`
+    (comma separated, `*` for all of them) and one per ticker in `tickers`.
+    `from`, `to` and `resolution` work like with `/charts/get`, every series is
+    in the requested `format`.
+    '''
+    start, end, resolution, points = chart_range(request)
+    types = [t for t in request.args.get('types', '').split(',') if t]
+    types = None if '*' in types else types
+    tickers = [t for t in request.args.get('tickers', '').split(',') if t]
+
+    if config.valuation_engine == 'numpy':
+        engine = await valuation_engine()
+        series = engine.chart_series(types, tickers, engine.columns(start, end, resolution))
+    else:
+        where, params = chart_dates(start, end, resolution)
+        series = await db.read(chart_series, types, tickers, where, params)
+
+    columnar = responses.columnar(request)
+
+    def encode(data):
+        data = downsampled(data, points)
+        if columnar:
+            return data
+        return [dict(zip(data, row)) for row in zip(*data.values())]
+
+    return sanic.response.json({
+        'total': encode(series['total']),
+        'types': {name: encode(data) for name, data in series['types'].items()},
+        'tickers': {name: encode(data) for name, data in series['tickers'].items()},
+    })
+
+
+PRICES = paging.ListQuery(
+    columns={
+        'date': 'date(pt.day + 2440587.5)',
+        'ticker': 'ii.ticker',
+        'open': 'po.open',
+        'high': 'po.high',
+        'low': 'po.low',
+        'close': 'pt.close',
+        'dividends': 'pt.dividends',
+        'splits': 'pt.splits',
+    },
+    source='''
+        prices AS pt
+        JOIN instrument_ids AS ii ON ii.id = pt.instrument
+        LEFT JOIN prices_ohlc AS po ON po.instrument = pt.instrument AND po.day = pt.day
+    ''',
+    key=('date',),
+    # pages follow the (instrument, day) primary key, dates of the arguments and cursors are converted
+    stored={'date': ('pt.day', timeseries.day)},
+)
 
 
 @app.get("/prices/get")
+@cached
 async def prices(request:sanic.Request):
     filter = request.args.get('filter')
-    cursor = db.cursor()
-    cursor.execute('select * from historical where ticker = ?', [filter])
-    return sanic.response.json([dict(row) for row in cursor])
+    return await paging.respond(request, db, PRICES, ['ii.ticker = ?'], [filter])
 
 
 @app.get("/instruments/list")
 async def instruments_list(request:sanic.Request):
-    cursor = db.cursor()
-    cursor.execute('SELECT * FROM instruments ORDER BY ticker')
-    return sanic.response.json([dict(d) for d in cursor])
+    rows = await db.fetchall('SELECT * FROM instruments ORDER BY ticker')
+    return sanic.response.json([dict(d) for d in rows])
 
 
 @app.post("/instruments/new")
 async def instruments_new(request:sanic.Request):
     data = request.json
-    cursor = db.cursor()
-    cursor.execute('''
-        INSERT INTO instruments(ticker, currency, dividend_currency, type, evaluation, eval_param)
-        VALUES (?, ?, ?, ?, ?, ?)
-        ON CONFLICT (ticker)
-        DO UPDATE SET currency = excluded.currency, dividend_currency = excluded.dividend_currency, type = excluded.type, evaluation = excluded.evaluation, eval_param = excluded.eval_param
-        ''',
-        [data['ticker'], data['currency'], data['dividend_currency'], data['type'], data['evaluation'], data['eval_param']]
-    )
-    db.commit()
+
+    def insert(conn):
+        conn.execute('''
+            INSERT INTO instruments(ticker, currency, dividend_currency, type, evaluation, eval_param)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (ticker)
+            DO UPDATE SET currency = excluded.currency, dividend_currency = excluded.dividend_currency, type = excluded.type, evaluation = excluded.evaluation, eval_param = excluded.eval_param
+            ''',
+            [data['ticker'], data['currency'], data['dividend_currency'], data['type'], data['evaluation'], data['eval_param']]
+        )
+        events.record(conn, ['instruments'], [data['ticker']])
+        # currency or evaluation may have changed
+        daily_values.update(conn, config.base_currency, {data['ticker']: daily_values.FIRST_DATE})
+
+    await db.write(insert)
     return sanic.response.json({'success': True})
 
 
 @app.get("/currencies/list")
 async def curr_list(request:sanic.Request):
-    cursor = db.cursor()
-    cursor.execute('SELECT * FROM currencies ORDER BY name')
-    return sanic.response.json([d['name'] for d in cursor])
+    rows = await db.fetchall('SELECT * FROM currencies ORDER BY name')
+    return sanic.response.json([d['name'] for d in rows])
 
 
 @app.post("/currencies/new")
 async def curr_new(request:sanic.Request):
     data = request.json
-    cursor = db.cursor()
-    cursor.execute(
-        'INSERT INTO currencies(name) VALUES (?)',
-        [data['currency']]
-    )
-    db.commit()
+
+    def insert(conn):
+        conn.execute('INSERT INTO currencies(name) VALUES (?)', [data['currency']])
+        events.record(conn, ['currencies'])
+
+    await db.write(insert)
     return sanic.response.json({'success': True})
 
 
 @app.get("/types/list")
 async def types_list(request:sanic.Request):
-    cursor = db.cursor()
-    cursor.execute('SELECT * FROM types ORDER BY name')
-    return sanic.response.json([d['name'] for d in cursor])
+    rows = await db.fetchall('SELECT * FROM types ORDER BY name')
+    return sanic.response.json([d['name'] for d in rows])
 
 
 @app.post("/types/new")
 async def types_new(request:sanic.Request):
     data = request.json
-    cursor = db.cursor()
-    cursor.execute(
-        'INSERT INTO types(name) VALUES (?)',
-        [data['type']]
-    )
-    db.commit()
+
+    def insert(conn):
+        conn.execute('INSERT INTO types(name) VALUES (?)', [data['type']])
+        events.record(conn, ['types'])
+
+    await db.write(insert)
     return sanic.response.json({'success': True})
 
 
+TRADES = paging.ListQuery(
+    columns={
+        'id': 'tt.id',
+        'date': 'tt.date',
+        'ticker': 'tt.ticker',
+        'volume': 'tt.volume',
+        'price': 'tt.price',
+        'fee': 'tt.fee',
+        'rate': 'tt.rate',
+        'currency': 'it.currency',
+    },
+    source='trades AS tt JOIN instruments AS it ON it.ticker = tt.ticker',
+    key=('date', 'id'),
+    descending=True,
+)
+
+
 @app.get("/trades/list")
 async def trades_list(request:sanic.Request):
     where = []
+    params = []
     ticker = request.args.get('ticker', None)
     if ticker is not None:
-        where.append(('ticker', ticker))
-    if where:
-        sql_where = ' AND '.join(f'{k} = ?' for k, _ in where)
-
-    cursor = db.cursor()
-    cursor.execute(f'''
-        SELECT id, date, tt.ticker, volume, price, fee, rate, it.currency
-        FROM trades AS tt
-        JOIN instruments AS it ON it.ticker = tt.ticker
-        {f'WHERE {sql_where}' if where else ''}
-        ORDER BY date DESC''',
-        [v for _, v in where]
-    )
-
-    return sanic.response.json([dict(d) for d in cursor])
+        where.append('tt.ticker = ?')
+        params.append(ticker)
+    return await paging.respond(request, db, TRADES, where, params)
 
 
 @app.post("/trades/new")
 async def trades_new(request:sanic.Request):
     data = request.json
-    cursor = db.cursor()
-    cursor.execute('''
-        INSERT INTO trades(date, ticker, volume, price, fee, rate)
-        VALUES (?, ?, ?, ?, ?, ?)''',
-        [data['date'], data['ticker'], data['volume'], data['price'], data['fee'], data['rate']]
-    )
-    db.commit()
+
+    def insert(conn):
+        conn.execute('''
+            INSERT INTO trades(date, ticker, volume, price, fee, rate)
+            VALUES (?, ?, ?, ?, ?, ?)''',
+            [data['date'], data['ticker'], data['volume'], data['price'], data['fee'], data['rate']]
+        )
+        events.record(conn, ['trades'], [data['ticker']])
+        daily_values.update(conn, config.base_currency, {data['ticker']: data['date']})
+
+    await db.write(insert)
     return sanic.response.json({'success': True})
 
 
+VALUES = paging.ListQuery(
+    columns={
+        'date': 'mvt.date',
+        'ticker': 'mvt.ticker',
+        'value': 'mvt.value',
+        'currency': 'it.currency',
+    },
+    source='manual_values AS mvt JOIN instruments AS it ON it.ticker = mvt.ticker',
+    key=('date', 'ticker'),
+    descending=True,
+)
+
+
 @app.get("/values/list")
 async def values_list(request:sanic.Request):
     where = []
+    params = []
     ticker = request.args.get('ticker', None)
     if ticker is not None:
-        where.append(('ticker', ticker))
-    if where:
-        sql_where = ' AND '.join(f'{k} = ?' for k, _ in where)
-    cursor = db.cursor()
-    cursor.execute(f'''
-        SELECT date, mvt.ticker, value, it.currency
-        FROM manual_values AS mvt
-        JOIN instruments AS it ON it.ticker = mvt.ticker
-        {f'WHERE {sql_where}' if where else ''}
-        ORDER BY date DESC''',
-        [v for _, v in where]
-    )
-    return sanic.response.json([dict(d) for d in cursor])
+        where.append('mvt.ticker = ?')
+        params.append(ticker)
+    return await paging.respond(request, db, VALUES, where, params)
 
 
 @app.post("/values/new")
 async def values_new(request:sanic.Request):
     data = request.json
-    cursor = db.cursor()
-    cursor.execute('''
-        INSERT INTO manual_values(date, ticker, value) VALUES (?, ?, ?)
-        ON CONFLICT (date, ticker)
-        DO UPDATE SET value = excluded.value''',
-        [data['date'], data['ticker'], data['value']]
-    )
-    db.commit()
+
+    def insert(conn):
+        conn.execute('''
+            INSERT INTO manual_values(date, ticker, value) VALUES (?, ?, ?)
+            ON CONFLICT (date, ticker)
+            DO UPDATE SET value = excluded.value''',
+            [data['date'], data['ticker'], data['value']]
+        )
+        events.record(conn, ['manual_values'], [data['ticker']])
+        daily_values.update(conn, config.base_currency, {data['ticker']: data['date']})
+
+    await db.write(insert)
     return sanic.response.json({'success': True})
 
 
+async def import_rows(request:sanic.Request, spec:imports.ImportSpec):
+    '''
+    Validates all rows and inserts them in one transaction, nothing is inserted
+    when any row is invalid or with `dry_run=1`.
+    '''
+    rows = imports.parse_body(request)
+    dry_run = request.args.get('dry_run', '') in ('1', 'true')
+
+    def run(conn):
+        records, errors = imports.validate(conn, spec, rows)
+        if not errors and not dry_run:
+            imports.insert(conn, spec, records, config.base_currency)
+        return records, errors
+
+    records, errors = await db.write(run)
+    return sanic.response.json(
+        {'success': not errors, 'dry_run': dry_run, 'rows': len(records), 'errors': errors},
+        status=400 if errors else 200,
+    )
+
+
+@app.post("/trades/import")
+async def trades_import(request:sanic.Request):
+    return await import_rows(request, imports.TRADES)
+
+
+@app.post("/values/import")
+async def values_import(request:sanic.Request):
+    return await import_rows(request, imports.VALUES)
+
+
+@app.post("/dividends/import")
+async def dividends_import(request:sanic.Request):
+    return await import_rows(request, imports.DIVIDENDS)
+
+
 @app.route("/")
 async def homepage(request):
     return await sanic.response.file(os.path.join(FILE_PATH, "../build/index.html"))
@@ -567,4 +908,7 @@ def open_web_browser():
 if __name__ == '__main__':
     if '--browser' in sys.argv:
         threading.Thread(target=open_web_browser).start()
-    app.run(host='localhost', port=8000, auto_reload=True, debug=True)
\ No newline at end of file
+    if '--production' in sys.argv:
+        app.run(host=config.host, port=config.port, workers=config.workers, access_log=False)
+    else:
+        app.run(host='localhost', port=8000, auto_reload=True, debug=True)
\ No newline at end of file
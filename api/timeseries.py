@@ -0,0 +1,98 @@
+import datetime
+import sqlite3
+from typing import Iterable
+
+
+# Prices and fx rates are stored in compact tables (migration 7): `day` is the number of days
+# since 1970-01-01 and instruments and currencies are referenced by the integer ids of
+# `instrument_ids` and `currency_ids`. `prices` and `fx_prices` are clustered on (id, day),
+# the rarely read open/high/low are archived in `prices_ohlc` and `fx_prices_ohlc`.
+# `historical` and `fx` are views of them with the original columns and accept inserts.
+
+EPOCH = datetime.date(1970, 1, 1).toordinal()
+MIN_DAY = -EPOCH
+MAX_DAY = datetime.date.max.toordinal() - EPOCH
+
+
+def day(date: str) -> int:
+    '''Day number of an ISO date, placeholders like `FIRST_DATE` fall before or after every day.'''
+    try:
+        return datetime.date.fromisoformat(date[:10]).toordinal() - EPOCH
+    except ValueError:
+        return MIN_DAY if date < '0001' else MAX_DAY
+
+
+def instrument_ids(conn: sqlite3.Connection, tickers: Iterable[str]) -> dict[str, int]:
+    '''Ids of the tickers, new ones are assigned.'''
+    tickers = sorted(set(tickers))
+    conn.executemany('INSERT OR IGNORE INTO instrument_ids(ticker) VALUES (?)', [(t,) for t in tickers])
+    return {t: id for t, id in conn.execute(
+        f'SELECT ticker, id FROM instrument_ids WHERE ticker IN ({", ".join("?"*len(tickers))})', tickers,
+    )}
+
+
+def currency_ids(conn: sqlite3.Connection, names: Iterable[str]) -> dict[str, int]:
+    '''Ids of the currencies, new ones are assigned.'''
+    names = sorted(set(names))
+    conn.executemany('INSERT OR IGNORE INTO currency_ids(name) VALUES (?)', [(n,) for n in names])
+    return {n: id for n, id in conn.execute(
+        f'SELECT name, id FROM currency_ids WHERE name IN ({", ".join("?"*len(names))})', names,
+    )}
+
+
+def _known(values: tuple) -> bool:
+    return any(v is not None for v in values)
+
+
+def upsert_prices(conn: sqlite3.Connection, rows: list[tuple], keep_ohlc: bool = True):
+    '''Stores `(date, ticker, open, high, low, close, dividends, splits)` rows, replacing those of the same day.'''
+    ids = instrument_ids(conn, (r[1] for r in rows))
+    conn.executemany('''
+        INSERT INTO prices(instrument, day, close, dividends, splits) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (instrument, day)
+        DO UPDATE SET close = excluded.close, dividends = excluded.dividends, splits = excluded.splits
+    ''', [(ids[r[1]], day(r[0]), r[5], r[6], r[7]) for r in rows])
+    conn.executemany(
+        'DELETE FROM prices_ohlc WHERE instrument = ? AND day = ?',
+        [(ids[r[1]], day(r[0])) for r in rows if not keep_ohlc or not _known(r[2:5])],
+    )
+    if keep_ohlc:
+        conn.executemany('''
+            INSERT INTO prices_ohlc(instrument, day, open, high, low) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (instrument, day)
+            DO UPDATE SET open = excluded.open, high = excluded.high, low = excluded.low
+        ''', [(ids[r[1]], day(r[0]), r[2], r[3], r[4]) for r in rows if _known(r[2:5])])
+
+
+def upsert_fx(conn: sqlite3.Connection, rows: list[tuple], keep_ohlc: bool = True):
+    '''Stores `(date, from_curr, to_curr, open, high, low, close)` rows, replacing those of the same day.'''
+    ids = currency_ids(conn, [r[1] for r in rows] + [r[2] for r in rows])
+    conn.executemany('''
+        INSERT INTO fx_prices(from_id, to_id, day, close) VALUES (?, ?, ?, ?)
+        ON CONFLICT (from_id, to_id, day)
+        DO UPDATE SET close = excluded.close
+    ''', [(ids[r[1]], ids[r[2]], day(r[0]), r[6]) for r in rows])
+    conn.executemany(
+        'DELETE FROM fx_prices_ohlc WHERE from_id = ? AND to_id = ? AND day = ?',
+        [(ids[r[1]], ids[r[2]], day(r[0])) for r in rows if not keep_ohlc or not _known(r[3:6])],
+    )
+    if keep_ohlc:
+        conn.executemany('''
+            INSERT INTO fx_prices_ohlc(from_id, to_id, day, open, high, low) VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (from_id, to_id, day)
+            DO UPDATE SET open = excluded.open, high = excluded.high, low = excluded.low
+        ''', [(ids[r[1]], ids[r[2]], day(r[0]), r[3], r[4], r[5]) for r in rows if _known(r[3:6])])
+
+
+def delete_fx_pairs(conn: sqlite3.Connection, pairs: Iterable[tuple[str, str]]):
+    pairs = list(pairs)
+    for table in ('fx_prices', 'fx_prices_ohlc'):
+        conn.executemany(f'''
+            DELETE FROM {table}
+            WHERE from_id = (SELECT id FROM currency_ids WHERE name = ?) AND to_id = (SELECT id FROM currency_ids WHERE name = ?)
+        ''', pairs)
+
+
+def prune_ohlc(conn: sqlite3.Connection) -> int:
+    '''Drops the archived open/high/low of prices and fx rates, returns the number of deleted rows.'''
+    return conn.execute('DELETE FROM prices_ohlc').rowcount + conn.execute('DELETE FROM fx_prices_ohlc').rowcount
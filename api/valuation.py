@@ -0,0 +1,232 @@
+import sqlite3
+
+import numpy as np
+
+import arrays
+import daily_values
+
+
+DAY_BITS = 20
+
+
+def _as_of(keys: np.ndarray, group: np.ndarray, query_group: np.ndarray, query_keys: np.ndarray) -> np.ndarray:
+    '''
+    Index of the last row with key <= query key within the same group, -1 when there is none.
+    `keys` must be sorted and already combined with the group.
+    '''
+    idx = np.searchsorted(keys, query_keys, side='right') - 1
+    found = idx >= 0
+    found[found] = group[idx[found]] == query_group[found]
+    return np.where(found, idx, -1)
+
+
+def _sql_sum(values: np.ndarray) -> np.ndarray:
+    '''Column sums like SQL `sum`, NULL (NaN) when all inputs are NULL.'''
+    return np.where(np.isnan(values).all(axis=0), np.nan, np.nansum(values, axis=0))
+
+
+def _take(values: np.ndarray, idx: np.ndarray) -> np.ndarray:
+    if not len(values):
+        return np.full(len(idx), np.nan)
+    return np.where(idx >= 0, values[np.maximum(idx, 0)], np.nan)
+
+
+class ValuationEngine:
+    '''
+    In-memory counterpart of the `daily_values` table.
+
+    Trades, holding intervals, prices, fx rates and manual values are loaded once into sorted arrays.
+    Daily positions are computed for all instruments at once with cumulative sums
+    and as-of joins (sorted searches on combined instrument/day keys),
+    the result is kept as instrument x date matrices that are aggregated on request.
+    A loaded engine isn't changed anymore, newer data is loaded into a new engine.
+    '''
+
+    def __init__(self, base_currency: str):
+        self.base_currency = base_currency
+        self.version = None
+
+    def load(self, conn: sqlite3.Connection):
+        instruments = conn.execute('SELECT ticker, currency, type, evaluation FROM instruments ORDER BY ticker').fetchall()
+        self.tickers = [d['ticker'] for d in instruments]
+        self.types = np.array([d['type'] for d in instruments], dtype=object)
+        ticker_idx = {ticker: i for i, ticker in enumerate(self.tickers)}
+        currencies = sorted({d['currency'] for d in instruments})
+        currency_idx = {currency: i for i, currency in enumerate(currencies)}
+        instrument_currency = np.array([currency_idx[d['currency']] for d in instruments], dtype=np.int64)
+        manual = np.array([d['evaluation'] == 'manual' for d in instruments], dtype=bool)
+
+        trades = arrays.fetch(conn, '''
+            SELECT tt.ticker, date, volume, price, fee, rate FROM trades AS tt
+            JOIN instruments AS it ON it.ticker = tt.ticker
+            ORDER BY tt.ticker, date, id
+        ''')
+        prices = arrays.fetch(conn, '''
+            SELECT it.ticker, pt.day, pt.close FROM instruments AS it
+            JOIN instrument_ids AS ii ON ii.ticker = it.ticker
+            JOIN prices AS pt ON pt.instrument = ii.id
+            ORDER BY it.ticker, pt.day
+        ''')
+        rates = arrays.fetch(conn, '''
+            SELECT from_curr, date, rate FROM fx_daily
+            WHERE to_curr = ? AND from_curr IN (SELECT currency FROM instruments)
+            ORDER BY from_curr, date
+        ''', [self.base_currency])
+        intervals = arrays.fetch(conn, '''
+            SELECT pt.ticker, start_date, volume FROM positions AS pt
+            JOIN instruments AS it ON it.ticker = pt.ticker
+            ORDER BY pt.ticker, start_date
+        ''')
+        manual_values = arrays.fetch(conn, '''
+            SELECT mvt.ticker, date, value FROM manual_values AS mvt
+            JOIN instruments AS it ON it.ticker = mvt.ticker
+            ORDER BY mvt.ticker, date
+        ''')
+
+        trade_days = arrays.days([d[1] for d in trades])
+        price_days = np.array([d[1] for d in prices], dtype=np.int64)
+        rate_days = arrays.days([d[1] for d in rates])
+        manual_days = arrays.days([d[1] for d in manual_values])
+        days = arrays.days([d[0] for d in arrays.fetch(conn, daily_values.DATES_SQL, daily_values.dates_params(daily_values.FIRST_DATE))])
+        self.days = days
+        self.dates = np.datetime_as_string(days.astype('datetime64[D]')).tolist()
+        first_day = days[0] if len(days) else 0
+
+        def keys(group, day):
+            return (group << DAY_BITS) + (day - first_day)
+
+        n_tickers, n_days = len(self.tickers), len(days)
+        grid_group = np.repeat(np.arange(n_tickers, dtype=np.int64), n_days)
+        grid_day = np.tile(days, n_tickers)
+        grid_keys = keys(grid_group, grid_day)
+
+        # cumulative trades, a running sum stays NULL until its first non-NULL input
+        trade_group = np.array([ticker_idx[d[0]] for d in trades], dtype=np.int64)
+        volume, price, fee, rate = (arrays.column(trades, i) for i in (2, 3, 4, 5))
+        investment = np.where(np.isnan(volume) | (volume == 0), 1, volume)*price/np.where(np.isnan(rate) | (rate == 0), 1, rate)
+        cumulative = {}
+        starts = np.searchsorted(trade_group, np.arange(n_tickers))
+        ends = np.searchsorted(trade_group, np.arange(n_tickers), side='right')
+        for name, values in (('investment', investment), ('fee', fee)):
+            sums = np.empty(len(values))
+            counts = np.empty(len(values))
+            for start, end in zip(starts, ends):
+                sums[start:end] = np.cumsum(np.nan_to_num(values[start:end]))
+                counts[start:end] = np.cumsum(~np.isnan(values[start:end]))
+            cumulative[name] = np.where(counts > 0, sums, np.nan)
+        trade_keys = keys(trade_group, trade_days)
+        trade_idx = _as_of(trade_keys, trade_group, grid_group, grid_keys)
+
+        # split adjusted volume of the holding interval in force
+        interval_group = np.array([ticker_idx[d[0]] for d in intervals], dtype=np.int64)
+        interval_keys = keys(interval_group, arrays.days([d[1] for d in intervals]))
+        volume = _take(arrays.column(intervals, 2), _as_of(interval_keys, interval_group, grid_group, grid_keys))
+        investment = _take(cumulative['investment'], trade_idx)
+        fee = _take(cumulative['fee'], trade_idx)
+
+        price_group = np.array([ticker_idx[d[0]] for d in prices], dtype=np.int64)
+        price = _take(arrays.column(prices, 2), _as_of(keys(price_group, price_days), price_group, grid_group, grid_keys))
+
+        # daily rates are contiguous per currency, so the rate of a day is found by its offset,
+        # days outside the range take the first or the last rate
+        rate_group = np.array([currency_idx[d[0]] for d in rates], dtype=np.int64)
+        rate_values = arrays.column(rates, 2)
+        rate_starts = np.searchsorted(rate_group, np.arange(len(currencies)))
+        rate_counts = np.searchsorted(rate_group, np.arange(len(currencies)), side='right') - rate_starts
+        rate_first_day = rate_days[np.minimum(rate_starts, max(len(rate_days) - 1, 0))] if len(rate_days) else np.zeros(len(currencies), dtype=np.int64)
+        grid_currency = instrument_currency[grid_group]
+        offset = np.clip(grid_day - rate_first_day[grid_currency], 0, np.maximum(rate_counts[grid_currency] - 1, 0))
+        fx = _take(rate_values, np.where(rate_counts[grid_currency] > 0, rate_starts[grid_currency] + offset, -1))
+        if self.base_currency in currency_idx:
+            fx[grid_currency == currency_idx[self.base_currency]] = 1
+
+        # manual values, trades made after the last manual value are added to it
+        manual_group = np.array([ticker_idx[d[0]] for d in manual_values], dtype=np.int64)
+        manual_idx = _as_of(keys(manual_group, manual_days), manual_group, grid_group, grid_keys)
+        manual_value = _take(arrays.column(manual_values, 2), manual_idx)
+        manual_day = np.where(manual_idx >= 0, manual_days[np.maximum(manual_idx, 0)] if len(manual_days) else 0, first_day)
+        manual_investment = _take(cumulative['investment'], _as_of(trade_keys, trade_group, grid_group, keys(grid_group, manual_day)))
+        manual_investment = np.where(manual_idx >= 0, manual_investment, np.nan)
+        correction = np.nan_to_num(investment) - np.nan_to_num(manual_investment)
+
+        value = np.where(
+            manual[grid_group],
+            fx*(manual_value + correction),
+            fx*price*volume,
+        )
+
+        # instruments have rows from their first trade or manual value on
+        starts = np.full(n_tickers, np.iinfo(np.int64).max)
+        np.minimum.at(starts, trade_group, trade_days)
+        np.minimum.at(starts, manual_group, manual_days)
+        exists = grid_day >= starts[grid_group]
+
+        shape = (n_tickers, n_days)
+        self.exists = exists.reshape(shape)
+        self.volume = volume.reshape(shape)
+        self.investment = investment.reshape(shape)
+        self.fee = fee.reshape(shape)
+        self.value = value.reshape(shape)
+
+    def columns(self, start: str|None = None, end: str|None = None, resolution: str = 'daily') -> np.ndarray:
+        '''Date indices within the range, for weekly and monthly resolution the last date of each period.'''
+        first = np.searchsorted(self.days, arrays.days([start])[0]) if start else 0
+        last = np.searchsorted(self.days, arrays.days([end])[0], side='right') if end else len(self.days)
+        days = self.days[first:last]
+        if resolution == 'weekly':
+            # 1970-01-05 was a Monday
+            periods = (days - 4)//7
+        elif resolution == 'monthly':
+            periods = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        else:
+            return np.arange(first, last)
+        return first + np.flatnonzero(np.append(periods[1:] != periods[:-1], True))
+
+    def _series(self, groups: dict, columns: np.ndarray|None) -> dict:
+        '''
+        Column lists of chart rows of each group of instruments (a row mask), dates with an investment only.
+        The cells of the date columns are selected once for all the groups.
+        '''
+        if columns is None:
+            columns = np.arange(len(self.dates))
+        selected = np.logical_or.reduce(list(groups.values())) if groups else np.zeros(len(self.tickers), dtype=bool)
+        exists = self.exists[selected][:, columns]
+        fee, investment, value = (np.where(exists, m[selected][:, columns], np.nan) for m in (self.fee, self.investment, self.value))
+        dates = np.array(self.dates, dtype=object)[columns]
+        result = {}
+        for key, rows in groups.items():
+            rows = rows[selected]
+            # a group of all the selected rows (the total or a single filter) needs no copy
+            sums = [_sql_sum(m if rows.all() else m[rows]) for m in (fee, investment, value)]
+            profit = sums[2] - sums[1] - sums[0]
+            having = ~np.isnan(sums[1]) & (sums[1] != 0)
+            result[key] = {
+                'date': dates[having].tolist(),
+                'fee': arrays.nullable(sums[0][having]),
+                'investment': arrays.nullable(sums[1][having]),
+                'value': arrays.nullable(sums[2][having]),
+                'profit': arrays.nullable(profit[having]),
+            }
+        return result
+
+    def charts(self, filter: str|None = None, columns: np.ndarray|None = None) -> dict[str, list]:
+        '''Column lists of the chart rows of all instruments or those of a ticker or type.'''
+        rows = np.ones(len(self.tickers), dtype=bool)
+        if filter:
+            rows = (np.array(self.tickers, dtype=object) == filter) | (self.types == filter)
+        return self._series({None: rows}, columns)[None]
+
+    def chart_series(self, types: list[str]|None, tickers: list[str], columns: np.ndarray|None = None) -> dict:
+        '''Chart rows of the total, per type (all of them when `types` is None) and per ticker.'''
+        if types is None:
+            types = sorted(set(self.types.tolist()))
+        ticker_names = np.array(self.tickers, dtype=object)
+        groups = {('total', None): np.ones(len(self.tickers), dtype=bool)}
+        groups.update({('types', type): self.types == type for type in types})
+        groups.update({('tickers', ticker): ticker_names == ticker for ticker in tickers})
+        series = self._series(groups, columns)
+        return {
+            'total': series[('total', None)],
+            'types': {type: series[('types', type)] for type in types},
+            'tickers': {ticker: series[('tickers', ticker)] for ticker in tickers},
+        }
@@ -0,0 +1,172 @@
+'''
+Generates a synthetic portfolio database from database.sql for benchmarking.
+
+    python benchmarks/generate.py bench.db --tickers 50 --years 10
+'''
+import argparse
+import csv
+import datetime
+import json
+import os
+import random
+import sqlite3
+
+FILE_PATH = os.path.dirname(__file__)
+TYPES = ('stock', 'fund', 'bond')
+
+
+def business_days(start: datetime.date, years: int) -> list[str]:
+    days = (start + datetime.timedelta(days=d) for d in range(round(365.25*years)))
+    return [d.isoformat() for d in days if d.weekday() < 5]
+
+
+def random_walk(rng: random.Random, start: float, steps: int, volatility: float) -> list[float]:
+    values = []
+    value = start
+    for _ in range(steps):
+        value *= 1 + rng.gauss(0, volatility)
+        values.append(round(value, 4))
+    return values
+
+
+def write_fixture(path: str, bars: list[tuple]):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(('date', 'open', 'high', 'low', 'close', 'dividends', 'splits'))
+        writer.writerows(bars)
+
+
+def generate(
+    path: str,
+    tickers: int = 50,
+    years: int = 10,
+    trades_per_year: float = 12,
+    manual: int = 5,
+    http: int = 2,
+    currencies: tuple[str, ...] = ('USD', 'EUR'),
+    base_currency: str = 'CZK',
+    start: datetime.date = datetime.date(2010, 1, 4),
+    seed: int = 1,
+    fixtures: str|None = None,
+    fx_pivot: str = 'USD',
+):
+    '''
+    Writes a new database at `path`. Instruments are evaluated by yfinance except
+    the first `manual` (manual values) and the next `http` ones, their currencies
+    cycle through the base currency and `currencies`.
+    With `fixtures` the price history of the instruments and the rates of the pairs
+    against `fx_pivot` are also written there as files for the offline fixture provider.
+    '''
+    rng = random.Random(seed)
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    with open(os.path.join(FILE_PATH, '../database.sql')) as f:
+        conn.executescript(f.read())
+
+    days = business_days(start, years)
+    all_currencies = (base_currency,) + tuple(c for c in currencies if c != base_currency)
+    conn.executemany('INSERT INTO currencies(name) VALUES (?)', [(c,) for c in all_currencies])
+    conn.executemany('INSERT INTO types(name) VALUES (?)', [(t,) for t in TYPES])
+
+    fx = {base_currency: [1.0]*len(days)}
+    for currency in all_currencies[1:]:
+        fx[currency] = random_walk(rng, rng.uniform(15, 30), len(days), 0.005)
+        conn.executemany(
+            'INSERT INTO fx(date, from_curr, to_curr, open, high, low, close) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [(d, currency, base_currency, r, r, r, r) for d, r in zip(days, fx[currency])],
+        )
+
+    if fixtures:
+        os.makedirs(fixtures, exist_ok=True)
+        if fx_pivot in fx:
+            for currency in fx.keys() - {fx_pivot}:
+                rates = [round(r/p, 6) for r, p in zip(fx[currency], fx[fx_pivot])]
+                write_fixture(os.path.join(fixtures, f'{currency}-{fx_pivot}.csv'), [(d, r, r, r, r, 0, 0) for d, r in zip(days, rates)])
+
+    trade_probability = min(trades_per_year/252, 1)
+    for i in range(tickers):
+        ticker = f'T{i:04d}'
+        currency = all_currencies[i % len(all_currencies)]
+        if i < manual:
+            evaluation, eval_param = 'manual', None
+        elif i < manual + http:
+            evaluation = 'http'
+            eval_param = json.dumps({'url': f'http://localhost/{ticker}.json', 'date': 'date', 'close': 'close'})
+        else:
+            evaluation, eval_param = 'yfinance', None
+        conn.execute(
+            'INSERT INTO instruments(ticker, currency, type, evaluation, eval_param, dividend_currency) VALUES (?, ?, ?, ?, ?, ?)',
+            [ticker, currency, TYPES[i % len(TYPES)], evaluation, eval_param, currency],
+        )
+
+        prices = random_walk(rng, rng.uniform(10, 500), len(days), 0.01)
+        first = rng.randrange(len(days)//2)
+        split_day = rng.randrange(first, len(days)) if evaluation != 'manual' and rng.random() < 0.1 else None
+        trades = []
+        historical = []
+        values = []
+        dividends = []
+        volume = 0
+        for j in range(first, len(days)):
+            date, price = days[j], prices[j]
+            if j == first or rng.random() < trade_probability:
+                if evaluation == 'manual':
+                    trades.append((date, ticker, None, round(rng.uniform(1000, 10000), 2), rng.choice((0, 1.5)), 1/fx[currency][j]))
+                else:
+                    # mostly buys, sells never exceed the held volume
+                    delta = rng.choice((1, 2, 5, 10, -1)) if volume > 1 else rng.choice((1, 2, 5, 10))
+                    volume += delta
+                    trades.append((date, ticker, delta, price, rng.choice((0, 1.5)), 1/fx[currency][j]))
+            if evaluation == 'manual':
+                if (j - first) % 21 == 0:
+                    values.append((date, ticker, round(price*100, 2)))
+                continue
+            dividend = round(price*0.005, 4) if (j - first) % 63 == 62 else 0
+            split = 2.0 if j == split_day else 0
+            historical.append((date, ticker, price, price, price, price, dividend, split))
+            if dividend:
+                dividends.append((date, ticker, round(dividend*volume, 2)))
+        conn.executemany('INSERT INTO trades(date, ticker, volume, price, fee, rate) VALUES (?, ?, ?, ?, ?, ?)', trades)
+        conn.executemany('INSERT INTO historical(date, ticker, open, high, low, close, dividends, splits) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', historical)
+        conn.executemany('INSERT INTO manual_values(date, ticker, value) VALUES (?, ?, ?)', values)
+        conn.executemany('INSERT INTO dividends(date, ticker, dividend) VALUES (?, ?, ?)', dividends)
+        if fixtures and historical:
+            write_fixture(os.path.join(fixtures, f'{ticker}.csv'), [(d[0],) + d[2:] for d in historical])
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path')
+    parser.add_argument('--tickers', type=int, default=50)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--trades-per-year', type=float, default=12)
+    parser.add_argument('--manual', type=int, default=5, help='number of manually valued instruments')
+    parser.add_argument('--http', type=int, default=2, help='number of http instruments')
+    parser.add_argument('--currencies', default='USD,EUR', help='comma separated, besides the base currency')
+    parser.add_argument('--base-currency', default='CZK')
+    parser.add_argument('--start', type=datetime.date.fromisoformat, default=datetime.date(2010, 1, 4))
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--fixtures', help='directory for price and fx rate files of the fixture provider')
+    parser.add_argument('--fx-pivot', default='USD')
+    args = parser.parse_args()
+    generate(
+        args.path,
+        tickers=args.tickers,
+        years=args.years,
+        trades_per_year=args.trades_per_year,
+        manual=args.manual,
+        http=args.http,
+        currencies=tuple(c for c in args.currencies.split(',') if c),
+        base_currency=args.base_currency,
+        start=args.start,
+        seed=args.seed,
+        fixtures=args.fixtures,
+        fx_pivot=args.fx_pivot,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+'''
+Times the read endpoints through Sanic's test client against a synthetic database.
+
+    python benchmarks/run.py --tickers 50 --years 10 --save-baseline baseline.json
+    python benchmarks/run.py --tickers 50 --years 10 --baseline baseline.json
+
+Reports p50/p95 latency and the peak Python memory allocated while serving each
+endpoint. With `--baseline` the run exits with status 1 when any of them grew by
+more than `--tolerance` over the saved values. The response cache is disabled,
+so every request runs the handler. `/config/get` shows the fixed cost of a request.
+
+With `--updates` the market data updates are timed last, offline with the fixture
+provider reading the files generated next to the database (or `--fixtures`).
+'''
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import httpx
+
+import generate
+
+FILE_PATH = os.path.dirname(__file__)
+
+
+def endpoints(db_path: str) -> dict[str, str]:
+    '''Read endpoints by name, filtered ones use the busiest instrument and type.'''
+    conn = sqlite3.connect(db_path)
+    ticker, type = conn.execute('''
+        SELECT ticker, type FROM instruments
+        WHERE evaluation != 'manual'
+        ORDER BY (SELECT count(*) FROM trades WHERE trades.ticker = instruments.ticker) DESC
+        LIMIT 1
+    ''').fetchone()
+    conn.close()
+    return {
+        'config': '/config/get',
+        'data_last': '/data/last',
+        'overview': '/overview/get',
+        'performance': '/performance/get',
+        'performance_monthly': '/performance/get?period=month&format=columns',
+        'dividends_calc': '/dividends/calc',
+        'dividends_sum': '/dividends/sum',
+        'charts_total': '/charts/get',
+        'charts_type': f'/charts/get?filter={type}',
+        'charts_ticker': f'/charts/get?filter={ticker}',
+        'charts_monthly': '/charts/get?resolution=monthly',
+        'charts_points': '/charts/get?resolution=500',
+        'charts_columns': '/charts/get?format=columns',
+        'charts_batch': f'/charts/batch?types=*&tickers={ticker}&resolution=1000&format=columns',
+        'prices': f'/prices/get?filter={ticker}',
+        'prices_columns': f'/prices/get?filter={ticker}&format=columns',
+        'trades_list': '/trades/list',
+        'values_list': '/values/list',
+    }
+
+
+# run after the read endpoints, they rewrite the newest data
+UPDATES = {
+    'historical_update': '/historical/update',
+    'fx_update': '/fx/update',
+}
+
+
+def percentile(samples: list[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, round(p/100*(len(ordered) - 1)))]
+
+
+async def measure(app, urls: dict[str, str], repeat: int, warmup: int) -> dict[str, dict]:
+    client = app.asgi_client
+    # the first request starts the app and runs the server start listeners,
+    # the measured ones skip the test client's per request startup
+    _, response = await client.get('/config/get')
+    get = lambda url: httpx.AsyncClient.request(client, 'GET', url)
+    results = {}
+    for name, url in urls.items():
+        for _ in range(warmup):
+            response = await get(url)
+            if response.status_code != 200:
+                raise RuntimeError(f'{url} returned {response.status_code}: {response.text[:200]}')
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            await get(url)
+            samples.append(time.perf_counter() - start)
+        tracemalloc.start()
+        await get(url)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {
+            'p50_ms': round(statistics.median(samples)*1000, 3),
+            'p95_ms': round(percentile(samples, 95)*1000, 3),
+            'peak_kb': round(peak/1024, 1),
+        }
+        print(f'{name:<16} {results[name]["p50_ms"]:>10.2f} {results[name]["p95_ms"]:>10.2f} {results[name]["peak_kb"]:>12.1f}', flush=True)
+    return results
+
+
+def regressions(results: dict[str, dict], baseline: dict[str, dict], tolerance: float) -> list[str]:
+    found = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            base = baseline.get(name, {}).get(metric)
+            if base and value > base*(1 + tolerance):
+                found.append(f'{name} {metric}: {value} > {base} (+{(value/base - 1)*100:.0f}%)')
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', help='existing database, a synthetic one is generated when omitted')
+    parser.add_argument('--tickers', type=int, default=50)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--trades-per-year', type=float, default=12)
+    parser.add_argument('--manual', type=int, default=5)
+    parser.add_argument('--http', type=int, default=2)
+    parser.add_argument('--currencies', default='USD,EUR')
+    parser.add_argument('--base-currency', default='CZK')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--engine', choices=('sql', 'numpy'), default='sql', help='valuation_engine config')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--only', help='comma separated endpoint names')
+    parser.add_argument('--updates', action='store_true', help='also time market data updates from fixtures')
+    parser.add_argument('--fixtures', help='fixture directory of an existing database')
+    parser.add_argument('--save-baseline', metavar='PATH')
+    parser.add_argument('--baseline', metavar='PATH')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='allowed relative growth over the baseline')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='portfolio-bench-')
+    db_path = os.path.abspath(args.db) if args.db else os.path.join(workdir, 'bench.db')
+    fixtures = os.path.abspath(args.fixtures) if args.fixtures else os.path.join(workdir, 'fixtures')
+    if not args.db:
+        start = time.perf_counter()
+        generate.generate(
+            db_path,
+            tickers=args.tickers,
+            years=args.years,
+            trades_per_year=args.trades_per_year,
+            manual=args.manual,
+            http=args.http,
+            currencies=tuple(c for c in args.currencies.split(',') if c),
+            base_currency=args.base_currency,
+            seed=args.seed,
+            fixtures=fixtures,
+        )
+        print(f'generated {db_path} in {time.perf_counter() - start:.1f} s')
+
+    config_path = os.path.join(workdir, 'config.json')
+    with open(config_path, 'w') as f:
+        json.dump({
+            'db': db_path,
+            'base_currency': args.base_currency,
+            'language_locale': 'en',
+            'valuation_engine': args.engine,
+            'cache_max_bytes': 0,
+            'market_data_fixtures': fixtures,
+        }, f)
+    os.environ['PORTFOLIO_CONFIG'] = config_path
+    sys.path.insert(0, os.path.join(FILE_PATH, '../api'))
+    import server
+
+    urls = endpoints(db_path)
+    if args.updates:
+        urls.update(UPDATES)
+    if args.only:
+        urls = {name: urls[name] for name in args.only.split(',')}
+
+    print(f'{"endpoint":<16} {"p50 ms":>10} {"p95 ms":>10} {"peak KiB":>12}')
+    results = asyncio.run(measure(server.app, urls, args.repeat, args.warmup))
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'baseline saved to {args.save_baseline}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for line in found:
+            print(f'REGRESSION {line}')
+        if found:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
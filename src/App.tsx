@@ -27,7 +27,7 @@ import NotificationsNoneIcon from '@mui/icons-material/NotificationsNone';
 import { Refresh, Speed } from '@mui/icons-material';
 import { CircularProgress, Icon, LinearProgress } from '@mui/material';
 
-import { Config } from './common';
+import { Config, DataChange, affects } from './common';
 import { Trades } from './sections/Trades';
 import { Overview } from './sections/Overview';
 import { Performance } from './sections/Performance';
@@ -114,6 +114,16 @@ interface LastData {
   manual_value: string;
 }
 
+interface JobStatus {
+  id: string;
+  kind: string;
+  status: 'running'|'done'|'failed';
+}
+
+interface HelloEvent extends DataChange {
+  missed?: boolean;
+}
+
 interface AppState {
   refreshing: boolean;
   isBusy: boolean;
@@ -121,6 +131,7 @@ interface AppState {
   lastData: LastData;
   heading: string;
   config: Config;
+  dataChange: DataChange|null;
 }
 
 export default class App extends React.Component<{}, AppState> {
@@ -141,15 +152,42 @@ export default class App extends React.Component<{}, AppState> {
         manual_value: '',
       },
       heading: '',
+      dataChange: null,
     }
 
     this.displayProgressBar = this.displayProgressBar.bind(this);
     this.setHeading = this.setHeading.bind(this);
   }
 
+  events: EventSource|null = null;
+
   componentDidMount() {
     this.loadConfig();
     this.loadLastDataDates();
+    this.listenToEvents();
+  }
+
+  componentWillUnmount() {
+    this.events?.close();
+  }
+
+  // data changes and update progress are pushed by the server, the browser reconnects by itself
+  listenToEvents = () => {
+    this.events = new EventSource('/events');
+    this.events.addEventListener('hello', e => {
+      const hello: HelloEvent = JSON.parse((e as MessageEvent).data);
+      if (hello.missed) this.handleDataChange(hello);
+    });
+    this.events.addEventListener('data', e => this.handleDataChange(JSON.parse((e as MessageEvent).data)));
+    this.events.addEventListener('job', e => {
+      const job: JobStatus = JSON.parse((e as MessageEvent).data);
+      if (job.kind === 'market_data') this.setState({refreshing: job.status === 'running'});
+    });
+  }
+
+  handleDataChange = (dataChange: DataChange) => {
+    this.setState({dataChange});
+    if (affects(dataChange, ['historical', 'fx', 'manual_values'])) this.loadLastDataDates();
   }
 
   loadConfig = () => {
@@ -161,16 +199,15 @@ export default class App extends React.Component<{}, AppState> {
   loadLastDataDates = () => {
     return fetch('/data/last')
       .then(res => res.json())
-      .then(lastData => this.setState({lastData, refreshing: false}));
+      .then(lastData => this.setState({lastData}));
   }
 
+  // the job and the changed data are followed through the events
   refreshData = () => {
     this.setState({refreshing: true});
-    return fetch('/historical/update').then(res =>
-      fetch('/fx/update').then(res =>
-        this.loadLastDataDates()
-      )
-    )
+    return fetch('/market_data/update')
+      .then<JobStatus>(res => res.json())
+      .then(job => this.setState({refreshing: job.status === 'running'}));
   }
 
   displayProgressBar(isBusy: boolean) {
@@ -282,28 +319,28 @@ export default class App extends React.Component<{}, AppState> {
           <DrawerHeader />
           <Routes>
             <Route path="overview" element={
-              <Overview config={this.state.config} setHeading={this.setHeading} displayProgressBar={this.displayProgressBar} />
+              <Overview config={this.state.config} setHeading={this.setHeading} displayProgressBar={this.displayProgressBar} dataChange={this.state.dataChange} />
             }/>
             <Route path="performance" element={
-              <Performance config={this.state.config} setHeading={this.setHeading} displayProgressBar={this.displayProgressBar} />
+              <Performance config={this.state.config} setHeading={this.setHeading} displayProgressBar={this.displayProgressBar} dataChange={this.state.dataChange} />
             }/>
             <Route path="trades" element={
-              <Trades config={this.state.config} setHeading={this.setHeading} displayProgressBar={this.displayProgressBar} />
+              <Trades config={this.state.config} setHeading={this.setHeading} displayProgressBar={this.displayProgressBar} dataChange={this.state.dataChange} />
             }/>
             <Route path="dividends" element={
-              <Dividends config={this.state.config} setHeading={this.setHeading} displayProgressBar={this.displayProgressBar} />
+              <Dividends config={this.state.config} setHeading={this.setHeading} displayProgressBar={this.displayProgressBar} dataChange={this.state.dataChange} />
             }/>
             <Route path="charts" element={
-              <Charts config={this.state.config} setHeading={this.setHeading} displayProgressBar={this.displayProgressBar} />
+              <Charts config={this.state.config} setHeading={this.setHeading} displayProgressBar={this.displayProgressBar} dataChange={this.state.dataChange} />
             }/>
             <Route path="settings" element={
-              <Settings config={this.state.config} setHeading={this.setHeading} displayProgressBar={this.displayProgressBar} />
+              <Settings config={this.state.config} setHeading={this.setHeading} displayProgressBar={this.displayProgressBar} dataChange={this.state.dataChange} />
             }/>
             <Route path="values" element={
-              <Values config={this.state.config} setHeading={this.setHeading} displayProgressBar={this.displayProgressBar} />
+              <Values config={this.state.config} setHeading={this.setHeading} displayProgressBar={this.displayProgressBar} dataChange={this.state.dataChange} />
             }/>
             <Route path="prices" element={
-              <Prices config={this.state.config} setHeading={this.setHeading} displayProgressBar={this.displayProgressBar} />
+              <Prices config={this.state.config} setHeading={this.setHeading} displayProgressBar={this.displayProgressBar} dataChange={this.state.dataChange} />
             }/>
             <Route path="/" element={<Navigate to="overview" />} />
           </Routes>
@@ -5,14 +5,51 @@ export interface Config {
     language_locale: string;
 }
 
+// a committed change pushed by `/events`, incomplete when the changes since the last one are unknown
+export interface DataChange {
+    id: number;
+    tables: Array<string>;
+    tickers: Array<string>;
+    complete: boolean;
+}
+
+export function affects(change: DataChange, tables: Array<string>): boolean {
+    return !change.complete || tables.some(table => change.tables.includes(table));
+}
+
 export interface SectionProps {
     config: Config;
     setHeading: (name:string) => void;
     displayProgressBar: (isBusy: boolean) => void;
+    dataChange?: DataChange|null;
 }
 
 export interface SectionState {}
 
+// response of `format=columns`, every field is listed once with the values of all rows
+export type Columns<T> = {[K in keyof T]: Array<T[K]>};
+
+export function fromColumns<T>(columns: Columns<T>): Array<T> {
+    const names = Object.keys(columns) as Array<keyof T>;
+    const length = names.length ? columns[names[0]].length : 0;
+    const rows: Array<T> = [];
+    for (let i = 0; i < length; i++) {
+        const row = {} as T;
+        names.forEach(name => { row[name] = columns[name][i]; });
+        rows.push(row);
+    }
+    return rows;
+}
+
+// fetches rows in the compact columnar format
+export function fetchRows<T>(path: string, params?: URLSearchParams): Promise<Array<T>> {
+    const query = new URLSearchParams(params);
+    query.set('format', 'columns');
+    return fetch(`${path}?${query.toString()}`)
+        .then<Columns<T>>(res => res.json())
+        .then(columns => fromColumns(columns));
+}
+
 export abstract class AbstractSection<P = {}, S = {}, SS = {}> extends React.Component<P & SectionProps, S & SectionState, SS> {
 
     abstract sectionName():string;
@@ -21,6 +58,14 @@ export abstract class AbstractSection<P = {}, S = {}, SS = {}> extends React.Com
         this.props.setHeading(this.sectionName());
     }
 
+    componentDidUpdate(prevProps: Readonly<P & SectionProps>) {
+        const change = this.props.dataChange;
+        if (change && change !== prevProps.dataChange) this.onDataChange(change);
+    }
+
+    // reloads what the change affects, sections without derived data ignore it
+    onDataChange(change: DataChange) {}
+
     formatCurrency(value: number, currency?: string): string|null {
         if (value && (this.props.config.base_currency || currency))
             return value.toLocaleString(
@@ -1,6 +1,6 @@
 import { Box, FormControl, InputLabel, Select, MenuItem, ListSubheader } from '@mui/material';
 import { LineChart, CartesianGrid, Line, XAxis, YAxis, Tooltip, Legend, ResponsiveContainer } from 'recharts';
-import { AbstractSection, SectionProps } from '../common';
+import { AbstractSection, SectionProps, DataChange, Columns, affects, fromColumns } from '../common';
 import { InstrumentDataRow } from './Settings';
 
 
@@ -12,17 +12,62 @@ interface ChartDataRow {
     profit: number;
 }
 
-type ChartResponse = Array<ChartDataRow>;
+interface ChartBatchResponse {
+    total: Columns<ChartDataRow>;
+    types: {[type: string]: Columns<ChartDataRow>};
+    tickers: {[ticker: string]: Columns<ChartDataRow>};
+}
+
+// selected series by name, the total when nothing is selected
+type ChartSeries = {[name: string]: Array<ChartDataRow>};
 
 interface ChartState {
-    chartData: Array<ChartDataRow>;
+    series: ChartSeries;
     instruments: Array<InstrumentDataRow>;
     types: Array<string>;
-    filter: string|null;
+    filters: Array<string>;
 }
 
 interface ChartProps {}
 
+// the chart can't show more points than this anyway, the server downsamples the series
+const CHART_POINTS = 1000;
+
+const COLORS = ['#8884d8', '#82ca9d', '#ff704d', '#ffc658', '#8dd1e1', '#a4de6c', '#d0ed57', '#d88884'];
+
+// filters are `type:<name>` or `ticker:<name>`, all the series come from one request
+function chartParams(filters: Array<string>): URLSearchParams {
+    const params = new URLSearchParams({resolution: CHART_POINTS.toString(), format: 'columns'});
+    const names = (kind: string) => filters.filter(f => f.startsWith(`${kind}:`)).map(f => f.slice(kind.length + 1));
+    params.append('types', names('type').join(','));
+    params.append('tickers', names('ticker').join(','));
+    return params;
+}
+
+function loadSeries(filters: Array<string>): Promise<ChartSeries> {
+    return fetch(`/charts/batch?${chartParams(filters).toString()}`)
+        .then<ChartBatchResponse>(res => res.json())
+        .then(data => {
+            if (!filters.length) return {total: fromColumns(data.total)};
+            const series: ChartSeries = {};
+            filters.forEach(filter => {
+                const [kind, name] = [filter.slice(0, filter.indexOf(':')), filter.slice(filter.indexOf(':') + 1)];
+                series[name] = fromColumns(kind === 'type' ? data.types[name] : data.tickers[name]);
+            });
+            return series;
+        });
+}
+
+// values of several series by date for comparing them in one chart
+function mergeValues(series: ChartSeries): Array<{[key: string]: string|number}> {
+    const byDate = new Map<string, {[key: string]: string|number}>();
+    Object.entries(series).forEach(([name, rows]) => rows.forEach(row => {
+        if (!byDate.has(row.date)) byDate.set(row.date, {date: row.date});
+        byDate.get(row.date)![name] = row.value;
+    }));
+    return Array.from(byDate.values()).sort((a, b) => (a.date as string).localeCompare(b.date as string));
+}
+
 export class Charts extends AbstractSection<ChartProps, ChartState> {
 
     sectionName = () => 'Charts';
@@ -30,10 +75,10 @@ export class Charts extends AbstractSection<ChartProps, ChartState> {
     constructor(props: ChartProps & SectionProps) {
         super(props);
         this.state = {
-            chartData: [],
+            series: {},
             instruments: [],
             types: [],
-            filter: null,
+            filters: [],
         };
     }
 
@@ -46,50 +91,52 @@ export class Charts extends AbstractSection<ChartProps, ChartState> {
             fetch('/types/list')
             .then<Array<string>>(res => res.json())
             .then(types => {
-                fetch('/charts/get')
-                .then<ChartResponse>(res => res.json())
-                .then(chartData => {
-                    this.setState({chartData, instruments, types});
+                loadSeries([])
+                .then(series => {
+                    this.setState({series, instruments, types});
                     this.props.displayProgressBar(false);
                 });
             });
         });
     }
 
-    handleFilterChange(filter: string|null) {
-        this.setState({filter});
+    onDataChange(change: DataChange) {
+        if (affects(change, ['daily_values', 'instruments']))
+            loadSeries(this.state.filters).then(series => this.setState({series}));
+    }
+
+    handleFilterChange(filters: Array<string>) {
+        this.setState({filters});
         this.props.displayProgressBar(true);
-        const params = new URLSearchParams();
-        if (filter) params.append('filter', filter);
-        fetch(`/charts/get?${params.toString()}`)
-        .then<ChartResponse>(res => res.json())
-        .then(chartData => {
-            this.setState({chartData});
+        loadSeries(filters)
+        .then(series => {
+            this.setState({series});
             this.props.displayProgressBar(false);
         });
     }
 
     render() {
+        const names = Object.keys(this.state.series);
         return <Box>
             <FormControl fullWidth size='small'>
                 <InputLabel id="filter-select-label">Filter</InputLabel>
                 <Select
                     labelId='filter-select-label'
-                    value={this.state.filter}
+                    multiple
+                    value={this.state.filters}
                     label="Filter"
-                    onChange={(e) => this.handleFilterChange(e.target.value)}
+                    onChange={(e) => this.handleFilterChange(typeof e.target.value === 'string' ? e.target.value.split(',') : e.target.value)}
                 >
-                    <MenuItem>---</MenuItem>
                     <ListSubheader>types</ListSubheader>
-                    {this.state.types.map(v => <MenuItem value={v}>{v}</MenuItem>)}
+                    {this.state.types.map(v => <MenuItem value={`type:${v}`}>{v}</MenuItem>)}
                     <ListSubheader>instruments</ListSubheader>
-                    {this.state.instruments.map(v => <MenuItem value={v.ticker}>{v.ticker}</MenuItem>)}
+                    {this.state.instruments.map(v => <MenuItem value={`ticker:${v.ticker}`}>{v.ticker}</MenuItem>)}
                 </Select>
             </FormControl>
 
-            {this.state.chartData.length > 0 ?
+            {names.length === 1 && this.state.series[names[0]].length > 0 ?
                 <ResponsiveContainer width="100%" height={600}>
-                    <LineChart data={this.state.chartData} margin={{ top: 5, right: 30, left: 20, bottom: 5 }}>
+                    <LineChart data={this.state.series[names[0]]} margin={{ top: 5, right: 30, left: 20, bottom: 5 }}>
                         <CartesianGrid strokeDasharray="3 3" />
                         <Line type="monotone" dataKey="value" dot={false} stroke="#8884d8" />
                         <Line type="monotone" dataKey="investment" dot={false} stroke="#82ca9d" />
@@ -102,6 +149,19 @@ export class Charts extends AbstractSection<ChartProps, ChartState> {
                 </ResponsiveContainer> :
                 null
             }
+            {names.length > 1 ?
+                <ResponsiveContainer width="100%" height={600}>
+                    <LineChart data={mergeValues(this.state.series)} margin={{ top: 5, right: 30, left: 20, bottom: 5 }}>
+                        <CartesianGrid strokeDasharray="3 3" />
+                        {names.map((name, i) => <Line type="monotone" dataKey={name} dot={false} connectNulls stroke={COLORS[i % COLORS.length]} />)}
+                        <XAxis dataKey="date" angle={30} dy={30} dx={6} height={80}/>
+                        <YAxis tickFormatter={(v, i) => this.formatCurrency(v)||''} width={100}/>
+                        <Tooltip />
+                        <Legend />
+                    </LineChart>
+                </ResponsiveContainer> :
+                null
+            }
         </Box>
     }
-}
\ No newline at end of file
+}
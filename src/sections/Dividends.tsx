@@ -1,5 +1,5 @@
 import React from "react";
-import { AbstractSection, SectionProps } from '../common';
+import { AbstractSection, SectionProps, DataChange, affects } from '../common';
 import { Table, TableBody, TableHead, TableContainer, TableRow, TableCell, Box, IconButton, FormControl, Select, InputLabel, MenuItem } from '@mui/material';
 import TextField from '@mui/material/TextField';
 import { AddBox } from '@mui/icons-material';
@@ -102,6 +102,10 @@ export class Dividends extends AbstractSection<DividendsProps, DividendsState> {
             }));
     }
 
+    onDataChange(change: DataChange) {
+        if (affects(change, ['dividends'])) this.loadDividends();
+    }
+
     loadDividends = () => {
         const params = new URLSearchParams();
         // params.append('ticker', 'CEZ.PR');
@@ -1,5 +1,5 @@
 import { Table, TableBody, TableHead, TableContainer, TableRow, TableCell, Box, Typography, Card, CardHeader, CardContent, Grid, FormGroup, Switch, FormControlLabel } from '@mui/material';
-import { AbstractSection, SectionProps } from '../common';
+import { AbstractSection, SectionProps, DataChange, affects, fetchRows } from '../common';
 
 
 interface OverviewDataRow {
@@ -22,7 +22,6 @@ interface DividendsDataRow {
     dividends: number;
 }
 
-type OverviewResponse = Array<OverviewDataRow>;
 type DividendsResponse = {[ticker:string]:DividendsDataRow};
 type DividendsSumResponse = {[ticker:string]:DividendsDataRow};
 
@@ -75,9 +74,13 @@ export class Overview extends AbstractSection<OverviewProps, OverviewState> {
         );
     }
 
+    onDataChange(change: DataChange) {
+        if (affects(change, ['daily_values', 'historical', 'fx', 'dividends', 'instruments']))
+            this.loadOverview().then(() => this.loadDividends()).then(() => this.loadDividendsSum());
+    }
+
     loadOverview() {
-        return fetch('/overview/get')
-            .then<OverviewResponse>(res => res.json())
+        return fetchRows<OverviewDataRow>('/overview/get')
             .then(overview => {
                 const types: Array<string> = [];
                 overview.forEach(v => {
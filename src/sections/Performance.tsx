@@ -1,5 +1,5 @@
-import { Table, TableBody, TableHead, TableContainer, TableRow, TableCell, Box, Card, CardContent, CardHeader, FormGroup, Switch, FormControlLabel } from '@mui/material';
-import { AbstractSection, SectionProps } from '../common';
+import { Table, TableBody, TableHead, TableContainer, TableRow, TableCell, Box, Card, CardContent, CardHeader, FormGroup, Switch, FormControlLabel, ToggleButtonGroup, ToggleButton } from '@mui/material';
+import { AbstractSection, SectionProps, DataChange, affects, fetchRows } from '../common';
 
 
 interface PerformanceRow {
@@ -7,17 +7,28 @@ interface PerformanceRow {
     investment:number;
     value:number;
     profit:number;
+    twr:number|null;
+    xirr:number|null;
 }
 
+interface PerformanceListRow extends PerformanceRow {
+    year:number;
+    period:string|number;
+    ticker:string;
+}
+
+type Period = 'year'|'quarter'|'month';
+
 interface PerformanceData {
-    [year:number]:{[ticker:string]:PerformanceRow}
+    [period:string]:{[ticker:string]:PerformanceRow}
 }
 
 interface PerformanceState {
     data:PerformanceData;
-    years:Array<number>;
+    periods:Array<string>;
     tickers:Array<string>;
     detailedView:boolean;
+    period:Period;
 }
 
 interface PerformanceProps {}
@@ -30,52 +41,69 @@ export class Performance extends AbstractSection<PerformanceProps, PerformanceSt
         super(props);
         this.state = {
             data: {},
-            years: [],
+            periods: [],
             tickers: [],
             detailedView: false,
+            period: 'year',
         };
     }
 
     componentDidMount() {
         super.componentDidMount();
         this.props.displayProgressBar(true)
-        this.loadPerformance().then(() =>
+        this.loadPerformance(this.state.period).then(() =>
             this.props.displayProgressBar(false)
         );
     }
 
-    loadPerformance() {
-        return fetch('/performance/get')
-            .then<PerformanceData>(res => res.json())
-            .then(data => {
-                this.setState({
-                    data,
-                    years: Object.keys(data).map(v => parseInt(v)).sort(),
-                    tickers: Object.values(data).reduce(
-                        (acc, curr) => {
-                            Object.keys(curr).forEach(ticker => {
-                                if (!acc.includes(ticker)) {
-                                    acc.push(ticker);
-                                }
-                            })
-                            return acc
-                        },
-                        []
-                    ).sort()
+    onDataChange(change: DataChange) {
+        if (affects(change, ['daily_values'])) this.loadPerformance(this.state.period);
+    }
+
+    loadPerformance(period: Period) {
+        return fetchRows<PerformanceListRow>('/performance/get', new URLSearchParams({period}))
+            .then(rows => {
+                const data: PerformanceData = {};
+                const periods: Array<string> = [];
+                const tickers: Array<string> = [];
+                // rows come ordered by period
+                rows.forEach(({year, period, ticker, ...row}) => {
+                    const key = period.toString();
+                    if (!(key in data)) {
+                        data[key] = {};
+                        periods.push(key);
+                    }
+                    data[key][ticker] = row;
+                    if (!tickers.includes(ticker)) tickers.push(ticker);
                 });
+                this.setState({data, periods, tickers: tickers.sort()});
             });
     }
 
+    handlePeriodChange(period: Period|null) {
+        if (!period) return;
+        this.setState({period});
+        this.props.displayProgressBar(true);
+        this.loadPerformance(period).then(() =>
+            this.props.displayProgressBar(false)
+        );
+    }
+
     render() {
         return <Box>
             <FormGroup>
                 <FormControlLabel control={<Switch checked={this.state.detailedView} onChange={(e, value) => this.setState({detailedView: value})}/>} label="Detailed view" />
+                <ToggleButtonGroup size='small' exclusive value={this.state.period} onChange={(e, value) => this.handlePeriodChange(value)}>
+                    <ToggleButton value='year'>Years</ToggleButton>
+                    <ToggleButton value='quarter'>Quarters</ToggleButton>
+                    <ToggleButton value='month'>Months</ToggleButton>
+                </ToggleButtonGroup>
             </FormGroup>
 
             { this.state.detailedView ?
-                Object.entries(this.state.data).map(([year, data], i) =>
+                this.state.periods.map((period, i) =>
                     <Card key={i} elevation={3} sx={{marginBottom: '1em'}}>
-                        <CardHeader title={year} />
+                        <CardHeader title={period} />
                         <CardContent>
                             <TableContainer>
                                 <Table size="small">
@@ -86,10 +114,12 @@ export class Performance extends AbstractSection<PerformanceProps, PerformanceSt
                                             <TableCell align='right'>Value</TableCell>
                                             <TableCell align='right'>Fee</TableCell>
                                             <TableCell colSpan={2} align='center'>Profit</TableCell>
+                                            <TableCell align='right'>TWR</TableCell>
+                                            <TableCell align='right'>XIRR</TableCell>
                                         </TableRow>
                                     </TableHead>
                                     <TableBody>
-                                        {Object.entries<PerformanceRow>(data).map(([ticker, d], i) =>
+                                        {Object.entries<PerformanceRow>(this.state.data[period]).map(([ticker, d], i) =>
                                             <TableRow key={i}>
                                                 <TableCell>{ticker}</TableCell>
                                                 <TableCell align='right'>{this.formatCurrency(d.investment)}</TableCell>
@@ -97,6 +127,8 @@ export class Performance extends AbstractSection<PerformanceProps, PerformanceSt
                                                 <TableCell align='right'>{this.formatCurrency(d.fee)}</TableCell>
                                                 <TableCell align='right'>{this.formatCurrency(d.profit)}</TableCell>
                                                 <TableCell align='left'>{this.formatPercents(d.profit/d.investment)}</TableCell>
+                                                <TableCell align='right'>{d.twr !== null ? this.formatPercents(d.twr) : null}</TableCell>
+                                                <TableCell align='right'>{d.xirr !== null ? this.formatPercents(d.xirr) : null}</TableCell>
                                             </TableRow>
                                         )}
                                     </TableBody>
@@ -110,8 +142,8 @@ export class Performance extends AbstractSection<PerformanceProps, PerformanceSt
                         <TableHead>
                             <TableRow>
                                 <TableCell></TableCell>
-                                {this.state.years.map(year =>
-                                    <TableCell key={year} align='center'>{year}</TableCell>
+                                {this.state.periods.map(period =>
+                                    <TableCell key={period} align='center'>{period}</TableCell>
                                 )}
                             </TableRow>
                         </TableHead>
@@ -119,9 +151,9 @@ export class Performance extends AbstractSection<PerformanceProps, PerformanceSt
                             {this.state.tickers.map(ticker =>
                                 <TableRow key={ticker}>
                                     <TableCell>{ticker}</TableCell>
-                                    {this.state.years.map(year =>
-                                        <TableCell key={year} align='center'>
-                                            {this.state.data[year][ticker] ? this.formatPercents(this.state.data[year][ticker].profit/this.state.data[year][ticker].investment) : null}
+                                    {this.state.periods.map(period =>
+                                        <TableCell key={period} align='center'>
+                                            {this.state.data[period][ticker] ? this.formatPercents(this.state.data[period][ticker].profit/this.state.data[period][ticker].investment) : null}
                                         </TableCell>
                                     )}
                                 </TableRow>
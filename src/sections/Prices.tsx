@@ -1,6 +1,6 @@
 import { Box, FormControl, InputLabel, Select, MenuItem, Slider } from '@mui/material';
 import { CartesianGrid, XAxis, YAxis, Tooltip, Area, ResponsiveContainer, ComposedChart, Bar, Cell, Line, Scatter } from 'recharts';
-import { AbstractSection, SectionProps } from '../common';
+import { AbstractSection, SectionProps, DataChange, affects, fetchRows } from '../common';
 import { InstrumentDataRow } from './Settings';
 
 
@@ -14,8 +14,6 @@ interface ChartDataRow {
     splits: number;
 }
 
-type ChartResponse = Array<ChartDataRow>;
-
 interface PricesState {
     chartData: Array<ChartDataRow>;
     instruments: Array<InstrumentDataRow>;
@@ -52,14 +50,19 @@ export class Prices extends AbstractSection<PricesProps, PricesState> {
         });
     }
 
+    onDataChange(change: DataChange) {
+        const filter = this.state.filter;
+        if (filter && affects(change, ['historical']) && (!change.complete || change.tickers.includes(filter)))
+            this.handleFilterChange(filter);
+    }
+
     handleFilterChange(filter: string|null) {
         const currency = this.state.instruments.find(v => v.ticker === filter)?.currency;
         this.setState({filter, currency});
         this.props.displayProgressBar(true);
         const params = new URLSearchParams();
         if (filter) params.append('filter', filter);
-        fetch(`/prices/get?${params.toString()}`)
-        .then<ChartResponse>(res => res.json())
+        fetchRows<ChartDataRow>('/prices/get', params)
         .then(chartData => {
             this.setState({chartData, dateRange: [0, chartData.length]});
             this.props.displayProgressBar(false);
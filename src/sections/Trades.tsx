@@ -1,5 +1,5 @@
 import React from "react";
-import { AbstractSection, SectionProps } from '../common';
+import { AbstractSection, SectionProps, DataChange, affects } from '../common';
 import { Table, TableBody, TableHead, TableContainer, TableRow, TableCell, Box, IconButton, FormControl, Select, InputLabel, MenuItem } from '@mui/material';
 import TextField from '@mui/material/TextField';
 import { AddBox } from '@mui/icons-material';
@@ -122,6 +122,10 @@ export class Trades extends AbstractSection<TradesProps, TradesState> {
             .then(instruments => this.setState({instruments}));
     }
 
+    onDataChange(change: DataChange) {
+        if (affects(change, ['trades'])) this.loadTrades();
+    }
+
     loadTrades = () => {
         const params = new URLSearchParams();
         // params.append('ticker', 'CEZ.PR');
@@ -1,5 +1,5 @@
 import React from 'react';
-import { AbstractSection, SectionProps } from '../common';
+import { AbstractSection, SectionProps, DataChange, affects } from '../common';
 import { Table, TableBody, TableHead, TableContainer, TableRow, TableCell, Box, IconButton, FormControl, Select, InputLabel, MenuItem } from '@mui/material';
 import TextField from '@mui/material/TextField';
 import { AddBox } from '@mui/icons-material';
@@ -104,6 +104,10 @@ export class Values extends AbstractSection<ValuesProps, ValuesState> {
             .then(instruments => this.setState({instruments}));
     }
 
+    onDataChange(change: DataChange) {
+        if (affects(change, ['manual_values'])) this.loadValues();
+    }
+
     loadValues = () => {
         const params = new URLSearchParams();
         // params.append('ticker', 'CEZ.PR');
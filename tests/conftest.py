@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the api modules import each other as top level modules, like when server.py runs as a script
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../api'))
@@ -0,0 +1,23 @@
+import sanic
+import sanic.response
+
+from cache import ResponseCache
+
+
+def test_cached_response_keeps_headers():
+    app = sanic.Sanic('CacheTest')
+    cached = ResponseCache(lambda: 1, 1024*1024)
+    calls = []
+
+    @app.get('/page')
+    @cached
+    async def page(request):
+        calls.append(request.args.get('limit'))
+        return sanic.response.json([1, 2, 3], headers={'X-Next-Cursor': 'abc'})
+
+    _, first = app.test_client.get('/page', params={'limit': '3'})
+    _, second = app.test_client.get('/page', params={'limit': '3'})
+    assert calls == ['3']
+    assert second.json == first.json == [1, 2, 3]
+    assert second.headers['x-next-cursor'] == first.headers['x-next-cursor'] == 'abc'
+    assert second.headers['etag'] == first.headers['etag']
@@ -0,0 +1,79 @@
+import os
+import sqlite3
+
+import pytest
+
+import daily_values
+import fx_rates
+import migrations
+import timeseries
+
+
+BASE = 'CZK'
+DAYS = ['2024-01-02', '2024-01-03', '2024-01-04', '2024-01-05', '2024-01-08', '2024-01-09', '2024-01-10', '2024-01-11', '2024-01-12']
+MORE_DAYS = ['2024-01-15', '2024-01-16', '2024-01-17']
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    with open(os.path.join(os.path.dirname(__file__), '../database.sql')) as f:
+        conn.executescript(f.read())
+    migrations.migrate(conn)
+    conn.executemany('INSERT INTO currencies(name) VALUES (?)', [('CZK',), ('USD',), ('EUR',)])
+    conn.execute("INSERT INTO types(name) VALUES ('stock')")
+    conn.executemany('INSERT INTO instruments(ticker, currency, type, evaluation) VALUES (?, ?, ?, ?)', [
+        ('AAA', 'USD', 'stock', 'yfinance'),
+        ('BBB', 'CZK', 'stock', 'yfinance'),
+        ('MMM', 'EUR', 'stock', 'manual'),
+    ])
+    timeseries.upsert_prices(conn, [(d, 'AAA', None, None, None, 100 + i, 0, 0) for i, d in enumerate(DAYS)])
+    timeseries.upsert_prices(conn, [(d, 'BBB', None, None, None, 50 - i, 0, 0) for i, d in enumerate(DAYS)])
+    timeseries.upsert_fx(conn, [(d, 'CZK', 'USD', None, None, None, 0.044 + i/10000) for i, d in enumerate(DAYS)])
+    timeseries.upsert_fx(conn, [(d, 'EUR', 'USD', None, None, None, 1.09 - i/1000) for i, d in enumerate(DAYS[1:])])
+    conn.executemany('INSERT INTO trades(date, ticker, volume, price, fee, rate) VALUES (?, ?, ?, ?, ?, ?)', [
+        ('2024-01-03', 'AAA', 10, 100, 1.5, 0.044),
+        ('2024-01-02', 'BBB', 5, 50, 0, None),
+        ('2024-01-03', 'MMM', None, 1000, 0, 0.04),
+    ])
+    conn.execute("INSERT INTO manual_values(date, ticker, value) VALUES ('2024-01-05', 'MMM', 1100)")
+    daily_values.rebuild(conn, BASE)
+    return conn
+
+
+def snapshot(conn: sqlite3.Connection) -> dict[str, list[tuple]]:
+    return {
+        'daily_values': [tuple(d) for d in conn.execute('SELECT * FROM daily_values ORDER BY ticker, date')],
+        'positions': [tuple(d) for d in conn.execute('SELECT * FROM positions ORDER BY ticker, start_date')],
+        'fx_daily': [tuple(d) for d in conn.execute('SELECT * FROM fx_daily ORDER BY from_curr, to_curr, date')],
+    }
+
+
+def test_incremental_updates_match_rebuild(conn):
+    # a trade
+    conn.execute("INSERT INTO trades(date, ticker, volume, price, fee, rate) VALUES ('2024-01-08', 'AAA', -3, 104, 1, 0.0445)")
+    daily_values.update(conn, BASE, {'AAA': '2024-01-08'})
+    # downloaded prices with a split, extending the data range
+    timeseries.upsert_prices(conn, [(d, 'BBB', None, None, None, (50 - i)/2, 0, 2 if d == '2024-01-09' else 0) for i, d in enumerate(DAYS + MORE_DAYS) if d >= '2024-01-09'])
+    daily_values.update(conn, BASE, {'BBB': '2024-01-09'})
+    # a downloaded fx pair, as the fx update applies it
+    timeseries.upsert_fx(conn, [(d, 'EUR', 'USD', None, None, None, 1.2 + i/1000) for i, d in enumerate(DAYS[6:] + MORE_DAYS)])
+    currencies = fx_rates.update_pairs(conn, BASE, {('EUR', 'USD'): DAYS[6]})
+    daily_values.update_currencies(conn, BASE, currencies)
+    # a manual value
+    conn.execute("INSERT INTO manual_values(date, ticker, value) VALUES ('2024-01-16', 'MMM', 1200)")
+    daily_values.update(conn, BASE, {'MMM': '2024-01-16'})
+    incremental = snapshot(conn)
+
+    conn.execute('DELETE FROM positions')
+    conn.execute('DELETE FROM fx_daily')
+    daily_values.rebuild(conn, BASE)
+    full = snapshot(conn)
+
+    assert [d['start_date'] for d in conn.execute("SELECT start_date FROM positions WHERE ticker = 'BBB' AND volume = 10")] == ['2024-01-09']
+    assert incremental['daily_values'][-1][:2] == ('2024-01-17', 'MMM')
+    for table, rows in full.items():
+        assert len(incremental[table]) == len(rows), table
+        for got, expected in zip(incremental[table], rows):
+            assert got == pytest.approx(expected, nan_ok=True), table
@@ -0,0 +1,18 @@
+import pytest
+
+import downsample
+
+
+def test_lttb_keeps_ends():
+    values = [0, 5, 1, 9, 2, 3, 8, 1, 4, 7]
+    picked = downsample.lttb(values, 4)
+    assert len(picked) == 4
+    assert picked[0] == 0 and picked[-1] == len(values) - 1
+    assert downsample.lttb(values, 2) == [0, len(values) - 1]
+    assert downsample.lttb(values, 20) == list(range(len(values)))
+
+
+@pytest.mark.parametrize('threshold', [1, 0, -1])
+def test_lttb_too_few_points(threshold):
+    with pytest.raises(ValueError):
+        downsample.lttb([1, 2, 3], threshold)
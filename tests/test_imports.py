@@ -0,0 +1,38 @@
+import sqlite3
+
+import pytest
+
+import imports
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.executescript('''
+        CREATE TABLE currencies(name TEXT NOT NULL UNIQUE);
+        CREATE TABLE instruments(ticker TEXT NOT NULL UNIQUE, currency TEXT NOT NULL, dividend_currency TEXT);
+        INSERT INTO currencies VALUES ('CZK'), ('USD');
+        INSERT INTO instruments VALUES ('AAPL', 'USD', NULL);
+    ''')
+    return conn
+
+
+def test_valid_row(conn):
+    records, errors = imports.validate(conn, imports.TRADES, [{'date': '2024-01-02', 'ticker': 'AAPL', 'volume': '2', 'price': 10}])
+    assert errors == []
+    assert len(records) == 1
+
+
+@pytest.mark.parametrize('row', [
+    {'date': '2024-01-02', 'ticker': 'AAPL', 'price': [1]},
+    {'date': '2024-01-02', 'ticker': 'AAPL', 'price': {'value': 1}},
+    {'date': '2024-01-02', 'ticker': 'AAPL', 'price': 'x'},
+    {'date': '2024-13-02', 'ticker': 'AAPL', 'price': 1},
+    {'date': '2024-01-02', 'ticker': 'MSFT', 'price': 1},
+    {'date': '2024-01-02', 'ticker': 'AAPL', 'price': 1, 'currency': ['USD']},
+])
+def test_invalid_row(conn, row):
+    records, errors = imports.validate(conn, imports.TRADES, [row])
+    assert records == []
+    assert [e['row'] for e in errors] == [1]
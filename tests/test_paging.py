@@ -0,0 +1,64 @@
+import json
+import sqlite3
+
+import pytest
+import sanic
+
+import paging
+from database import Database
+
+
+ITEMS = paging.ListQuery(
+    columns={'date': 'date', 'name': 'name'},
+    source='items',
+    key=('date',),
+)
+
+
+@pytest.fixture
+def app(tmp_path):
+    with sqlite3.connect(tmp_path/'test.db') as conn:
+        conn.executescript('''
+            CREATE TABLE items(date TEXT PRIMARY KEY, name TEXT);
+            INSERT INTO items VALUES ('2024-01-01', 'a'), ('2024-01-02', 'b'), ('2024-01-03', 'c');
+        ''')
+    db = Database(str(tmp_path/'test.db'), 1)
+    db.open()
+    app = sanic.Sanic('PagingTest')
+
+    @app.get('/items')
+    async def items(request):
+        return await paging.respond(request, db, ITEMS, [], [])
+
+    yield app
+    db.close()
+
+
+@pytest.mark.parametrize('limit', ['0', '-1', 'x'])
+def test_invalid_limit(app, limit):
+    _, response = app.test_client.get('/items', params={'limit': limit})
+    assert response.status == 400
+
+
+def test_pages(app):
+    _, response = app.test_client.get('/items', params={'limit': '2'})
+    assert [d['name'] for d in response.json] == ['a', 'b']
+    _, response = app.test_client.get('/items', params={'limit': '2', 'cursor': response.headers['x-next-cursor']})
+    assert [d['name'] for d in response.json] == ['c']
+    assert 'x-next-cursor' not in response.headers
+
+
+@pytest.mark.parametrize('args', [{'from': 'garbage'}, {'to': '2024-13-01'}, {'format': 'ndjson', 'limit': '2'}])
+def test_invalid_arguments(app, args):
+    _, response = app.test_client.get('/items', params=args)
+    assert response.status == 400
+
+
+def test_date_range(app):
+    _, response = app.test_client.get('/items', params={'from': '2024-01-02', 'to': '2024-01-02'})
+    assert [d['name'] for d in response.json] == ['b']
+
+
+def test_stream(app):
+    _, response = app.test_client.get('/items', params={'format': 'ndjson'})
+    assert [json.loads(line)['name'] for line in response.text.splitlines()] == ['a', 'b', 'c']
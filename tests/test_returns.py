@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+import arrays
+import returns
+
+
+def daily_values(rows: list[tuple[str, float, float, float]]) -> returns.DailyValues:
+    '''Daily values of one instrument from `(date, fee, investment, value)` rows.'''
+    fee, investment, value = (np.array([[r[i] for r in rows]], dtype=np.float64) for i in (1, 2, 3))
+    return returns.DailyValues(arrays.days([r[0] for r in rows]), ['A'], np.ones(fee.shape, dtype=bool), fee, investment, value)
+
+
+def test_missing_period():
+    # no dates in the second quarter, the third one follows the first
+    data = daily_values([
+        ('2021-01-04', 10, 1000, 1000),
+        ('2021-03-31', 10, 1000, 1100),
+        ('2021-07-01', 15, 3000, 3100),
+        ('2021-09-30', 15, 3000, 3300),
+    ])
+    result = returns.performance(data, 'quarter')
+    assert result['period'] == ['2021-Q1', '2021-Q3']
+    assert result['fee'] == [10, 5]
+    assert result['investment'] == [1000, 3100]
+    assert result['value'] == [1100, 3300]
+    assert result['profit'] == [90, 195]
+
+
+def test_consecutive_periods():
+    data = daily_values([
+        ('2020-01-02', 0, 1000, 1000),
+        ('2020-12-31', 0, 1000, 1100),
+        ('2021-12-31', 0, 1000, 1210),
+    ])
+    result = returns.performance(data, 'year')
+    assert result['year'] == [2020, 2021]
+    assert result['investment'] == [1000, 1100]
+    assert result['profit'] == pytest.approx([100, 110])
+    assert result['twr'] == pytest.approx([0.1, 0.1])